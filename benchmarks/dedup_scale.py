@@ -0,0 +1,334 @@
+"""
+Бенчмарк дедупа и нормализации на синтетических кастингах (русский + казахский) с репостами.
+
+Для каждого размера окна (сколько кастингов уже в индексе) меряем:
+  - стоимость вставки нового кастинга и задержку проверки репоста;
+  - время удержания блокировки индекса (threading.Lock + транзакция SQLite);
+  - память (пик tracemalloc на проверках, maxrss процесса, размер базы);
+  - ложные срабатывания (новый кастинг признан дублем) и пропуски (репост не пойман).
+Для маленьких окон рядом — старый способ: SequenceMatcher по всему окну.
+
+    python -m benchmarks.dedup_scale [--sizes 20,1000,10000,100000] [--queries 500] [--seed 1]
+        [--baseline-max 1000] [--out bench_dedup.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from difflib import SequenceMatcher
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from shared.dedup_index import DedupIndex
+from shared.isDuplicateCasting import dedup_key
+from shared.normalize import fingerprint, normalize
+
+# --- синтетический корпус ---------------------------------------------------
+# Контакты и названия вымышленные, структура — как у реальных постов в наших источниках.
+
+HEADERS_RU = ["Кастинг!", "🎬 КАСТИНГ", "Срочно ищем", "Открыт кастинг", "Внимание, кастинг", "Ищем актёров"]
+HEADERS_KZ = ["Кастинг!", "Актерлер қажет", "Жаңа кастинг", "Шұғыл іздейміз", "Кастинг жарияланды"]
+PROJECTS_RU = ["рекламу банка", "полный метр", "сериал", "клип", "короткометражку", "рекламу сока",
+               "веб-сериал", "документальный фильм", "фотосессию бренда", "рекламу маркетплейса"]
+PROJECTS_KZ = ["жарнамаға", "толықметражды фильмге", "сериалға", "клипке", "қысқаметражды фильмге",
+               "телехикаяға", "бренд фотосессиясына"]
+ROLES_RU = ["девушка 18-25 лет", "мужчина 30-40 лет", "ребёнок 7-10 лет", "пожилая пара", "спортсмен",
+            "бармен", "студенты", "мама с ребёнком", "охранник", "бизнесмен", "массовка", "врач"]
+ROLES_KZ = ["қыз 18-25 жас", "ер адам 30-40 жас", "бала 7-10 жас", "қарт жұбайлар", "спортшы",
+            "студенттер", "ана мен бала", "күзетші", "дәрігер", "массовка"]
+CITIES_RU = ["Алматы", "Астана", "Шымкент", "Караганда", "Москва", "Ташкент", "Бишкек"]
+CITIES_KZ = ["Алматы қаласында", "Астана қаласында", "Шымкентте", "Қарағандыда"]
+WORDS_RU = ("съёмка", "площадка", "смена", "опыт", "желательно", "гонорар", "оплата", "день", "вечер",
+            "костюм", "грим", "фото", "портфолио", "видеовизитка", "рост", "типаж", "европейский",
+            "азиатский", "спортивный", "улыбчивый", "высокий", "стройный", "брюнет", "блондинка",
+            "водительские", "права", "танцы", "вокал", "английский", "казахский", "павильон",
+            "натура", "ночная", "утренняя", "двухдневная", "реклама", "бренд", "роль", "эпизод",
+            "главная", "второстепенная", "текст", "проба", "самопроба", "дубль", "режиссёр")
+WORDS_KZ = ("түсірілім", "алаң", "тәжірибе", "қаламақы", "төлем", "күн", "кеш", "костюм", "грим",
+            "фото", "портфолио", "бой", "келбет", "еуропалық", "азиялық", "спорттық", "жүргізуші",
+            "куәлігі", "би", "ән", "ағылшын", "қазақ", "павильон", "түнгі", "таңғы", "рөл", "эпизод",
+            "басты", "мәтін", "сынама", "режиссер", "міндетті", "қажет", "тегін", "жол", "тамақ")
+CONTACTS = ["Пишите @casting_agent_{n}", "Контакт: +7 7{n:02d} 123 45 67", "Заявки в лс @cast_{n}",
+            "Байланыс: @kz_cast_{n}", "WhatsApp +7 70{n:01d} 555 00 11"]
+REPOST_PREFIXES = ["Репост:", "Переслано из канала", "🔥🔥🔥", "Актуально!", "Қайта жариялау:", "❗️"]
+REPOST_SUFFIXES = ["Подробнее в лс", "#кастинг #алматы", "Делитесь с друзьями!", "Толығырақ жеке хатта",
+                   "Подписывайтесь на канал"]
+
+
+def make_casting(rng: random.Random) -> str:
+    kazakh = rng.random() < 0.35
+    words = WORDS_KZ if kazakh else WORDS_RU
+    header = rng.choice(HEADERS_KZ if kazakh else HEADERS_RU)
+    project = rng.choice(PROJECTS_KZ if kazakh else PROJECTS_RU)
+    role = rng.choice(ROLES_KZ if kazakh else ROLES_RU)
+    city = rng.choice(CITIES_KZ if kazakh else CITIES_RU)
+    # 14–24 случайных слова описания — от них и зависит уникальность кастинга
+    description = " ".join(rng.choice(words) for _ in range(rng.randint(14, 24)))
+    date = f"{rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}"
+    fee = f"{rng.randint(10, 300) * 1000} тг"
+    contact = rng.choice(CONTACTS).format(n=rng.randint(0, 99))
+    return (f"{header} {project}\nТребуются: {role}\n{city}, {date}\n{description}\n"
+            f"Гонорар: {fee}\n{contact}")
+
+
+def make_repost(text: str, rng: random.Random) -> str:
+    """
+    Как пост выглядит в другом канале: обёртка, эмодзи, другие контакты, та же дата в другой записи,
+    мелкие правки. Другая дата — это уже новый набор (см. make_near_miss), а не репост.
+    """
+    lines = text.split("\n")
+    ops = rng.sample(["prefix", "suffix", "case", "punct", "contact", "date", "drop_word", "swap_words"],
+                     k=rng.randint(1, 3))
+    if "contact" in ops:
+        lines[-1] = rng.choice(CONTACTS).format(n=rng.randint(0, 99))
+    if "date" in ops:
+        city, date = lines[2].rsplit(", ", 1)
+        day, month = date.split(".")
+        lines[2] = f"{city}, {int(day)}/{int(month)}"
+    if "drop_word" in ops or "swap_words" in ops:
+        words = lines[3].split()
+        if len(words) > 4:
+            i = rng.randrange(len(words) - 1)
+            if "drop_word" in ops:
+                del words[i]
+            else:
+                words[i], words[i + 1] = words[i + 1], words[i]
+        lines[3] = " ".join(words)
+    result = "\n".join(lines)
+    if "case" in ops:
+        result = result.upper()
+    if "punct" in ops:
+        result = result.replace("\n", ". ").replace(",", " —")
+    if "prefix" in ops:
+        result = f"{rng.choice(REPOST_PREFIXES)}\n{result}"
+    if "suffix" in ops:
+        result = f"{result}\n{rng.choice(REPOST_SUFFIXES)}"
+    return result
+
+
+def make_rerun(text: str, rng: random.Random) -> str:
+    # Агентство повторяет набор по тому же шаблону на другую дату — это новый кастинг
+    lines = text.split("\n")
+    city, date = lines[2].rsplit(", ", 1)
+    day, month = (int(x) for x in date.split("."))
+    lines[2] = f"{city}, {(day + rng.randint(0, 26)) % 28 + 1:02d}.{month:02d}"
+    return "\n".join(lines)
+
+
+def make_near_miss(text: str, rng: random.Random) -> str:
+    # Тот же шаблон, но треть описания другая — это уже другой кастинг
+    lines = text.split("\n")
+    words = lines[3].split()
+    vocab = WORDS_KZ if any(w in WORDS_KZ for w in words) else WORDS_RU
+    for i in rng.sample(range(len(words)), k=max(1, len(words) // 3)):
+        words[i] = rng.choice(vocab)
+    lines[3] = " ".join(words)
+    return "\n".join(lines)
+
+
+# --- измерения --------------------------------------------------------------
+
+class TimedLock:
+    """
+    Замена DedupIndex._lock: считает, сколько держали блокировку.
+    """
+
+    def __init__(self, lock):
+        self.lock = lock
+        self.holds = []
+
+    def __enter__(self):
+        self.lock.acquire()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.holds.append(time.perf_counter() - self.started)
+        self.lock.release()
+        return False
+
+
+def pct(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def ms_summary(values):
+    return {
+        "n": len(values),
+        "p50_ms": round(pct(values, 0.50) * 1000, 3),
+        "p95_ms": round(pct(values, 0.95) * 1000, 3),
+        "p99_ms": round(pct(values, 0.99) * 1000, 3),
+        "max_ms": round(max(values) * 1000, 3) if values else 0.0,
+        "mean_ms": round(statistics.mean(values) * 1000, 3) if values else 0.0,
+    }
+
+
+def timed_check(index, text):
+    fingerprint.cache_clear()  # меряем честную стоимость, без кэша отпечатков
+    started = time.perf_counter()
+    is_dup, reason, _ = index.check_and_add(*dedup_key(text))
+    return time.perf_counter() - started, is_dup
+
+
+def bench_normalize(texts):
+    started = time.perf_counter()
+    for t in texts:
+        normalize(t)
+    normalize_s = time.perf_counter() - started
+    fingerprint.cache_clear()
+    started = time.perf_counter()
+    for t in texts:
+        fingerprint(t)
+    fingerprint_s = time.perf_counter() - started
+    fingerprint.cache_clear()
+    return {
+        "texts": len(texts),
+        "normalize_us": round(normalize_s / len(texts) * 1e6, 1),
+        "fingerprint_us": round(fingerprint_s / len(texts) * 1e6, 1),
+    }
+
+
+def bench_size(size, queries, rng, workdir, baseline_max):
+    db_path = os.path.join(workdir, f"dedup_{size}.db")
+    index = DedupIndex(db_path)
+    timed = TimedLock(index._lock)
+    index._lock = timed
+
+    stored, insert_times, collisions = [], [], 0
+    fill_started = time.perf_counter()
+    while len(stored) < size:
+        text = make_casting(rng)
+        elapsed, is_dup = timed_check(index, text)
+        if is_dup:
+            collisions += 1  # генератор выдал слишком похожий текст — в окно он не попал
+            continue
+        stored.append(text)
+        insert_times.append(elapsed)
+    fill_s = time.perf_counter() - fill_started
+    timed.holds.clear()
+
+    reposts = [make_repost(rng.choice(stored), rng) for _ in range(queries)]
+    near_misses = [make_near_miss(rng.choice(stored), rng) for _ in range(queries)]
+    # одинаковые перезапуски друг другу честные дубли — оставляем уникальные
+    reruns = list(dict.fromkeys(make_rerun(rng.choice(stored), rng) for _ in range(queries)))
+    fresh = [make_casting(rng) for _ in range(queries)]
+
+    repost_times, missed = [], 0
+    for text in reposts:
+        elapsed, is_dup = timed_check(index, text)
+        repost_times.append(elapsed)
+        missed += not is_dup
+    fresh_times, fresh_fp = [], 0
+    for text in fresh:
+        elapsed, is_dup = timed_check(index, text)
+        fresh_times.append(elapsed)
+        fresh_fp += is_dup
+    near_fp = 0
+    for text in near_misses:
+        _, is_dup = timed_check(index, text)
+        near_fp += is_dup
+    rerun_fp = 0
+    for text in reruns:
+        _, is_dup = timed_check(index, text)
+        rerun_fp += is_dup
+    lock_holds = list(timed.holds)
+
+    # Память — отдельным проходом: под tracemalloc всё в разы медленнее, задержки выше уже сняты
+    tracemalloc.start()
+    for _ in range(max(1, queries // 5)):
+        timed_check(index, make_repost(rng.choice(stored), rng))
+        timed_check(index, make_casting(rng))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {
+        "window": size,
+        "fill_s": round(fill_s, 2),
+        "fill_collisions": collisions,
+        # вставка в окно заданного размера — последние 10% заполнения
+        "insert": ms_summary(insert_times[-max(1, len(insert_times) // 10):]),
+        "lookup_repost": ms_summary(repost_times),
+        "lookup_new": ms_summary(fresh_times),
+        "lock_hold": ms_summary(lock_holds),
+        "false_negative_rate": round(missed / queries, 4),
+        "false_positive_rate": round(fresh_fp / queries, 4),
+        "false_positive_rate_near_miss": round(near_fp / queries, 4),
+        "false_positive_rate_rerun": round(rerun_fp / len(reruns), 4),
+        "tracemalloc_peak_kb": round(peak / 1024, 1),
+        "maxrss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "db_bytes": sum(os.path.getsize(p) for p in (db_path, db_path + "-wal") if os.path.exists(p)),
+    }
+    if size <= baseline_max:
+        result["baseline_linear_scan"] = bench_linear(stored, reposts, fresh)
+    index.con.close()
+    print(f"📏 окно {size:>6}: вставка p50 {result['insert']['p50_ms']}ms, репост p95 "
+          f"{result['lookup_repost']['p95_ms']}ms, lock p99 {result['lock_hold']['p99_ms']}ms, "
+          f"FN {result['false_negative_rate']:.2%}, FP {result['false_positive_rate']:.2%} "
+          f"(near-miss {result['false_positive_rate_near_miss']:.2%}, "
+          f"новая дата {result['false_positive_rate_rerun']:.2%})")
+    return result
+
+
+def bench_linear(stored, reposts, fresh, threshold=0.90):
+    # Старый дедуп: нормализуем и сравниваем SequenceMatcher'ом со всем окном
+    window = [normalize(t) for t in stored]
+
+    def check(text):
+        norm = normalize(text)
+        return any(SequenceMatcher(None, entry, norm).ratio() >= threshold for entry in window)
+
+    times, missed, fp = [], 0, 0
+    for text in reposts:
+        started = time.perf_counter()
+        missed += not check(text)
+        times.append(time.perf_counter() - started)
+    for text in fresh:
+        fp += check(text)
+    return {
+        "lookup_repost": ms_summary(times),
+        "false_negative_rate": round(missed / len(reposts), 4),
+        "false_positive_rate": round(fp / len(fresh), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="20,1000,10000,100000")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--baseline-max", type=int, default=1000, help="до какого окна гонять линейный перебор")
+    parser.add_argument("--out", type=Path, default=Path("bench_dedup.json"))
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    results = {
+        "seed": args.seed,
+        "queries": args.queries,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "normalize": bench_normalize([make_casting(rng) for _ in range(2000)]),
+        "windows": [],
+    }
+    with tempfile.TemporaryDirectory(prefix="bench_dedup_") as workdir:
+        for size in sizes:
+            results["windows"].append(bench_size(size, args.queries, random.Random(args.seed + size),
+                                                 workdir, args.baseline_max))
+
+    args.out.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"💾 Результаты: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Бенчмарк OCR: сырой Tesseract против предобработки + детектора текста (shared/ocr_extractor.py).
+
+Корпус — папка с картинками. Если рядом лежит <имя>.txt с эталонным текстом, точность считаем по нему,
+иначе — по совпадению с сырым OCR. Пустой .txt = на картинке текста нет (проверяем детектор).
+
+    python -m benchmarks.ocr_preprocess path/to/corpus [--out bench_ocr.json]
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from difflib import SequenceMatcher
+from pathlib import Path
+
+import pytesseract
+from PIL import Image
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from shared.normalize import normalize
+from shared.ocr_extractor import has_text, preprocess_for_ocr
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".webp"}
+LANG = "rus+eng"
+
+
+def similarity(a, b):
+    a, b = normalize(a), normalize(b)
+    if not a and not b:
+        return 1.0
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def run(corpus: Path):
+    rows = []
+    for path in sorted(p for p in corpus.iterdir() if p.suffix.lower() in IMAGE_EXTS):
+        truth_path = path.with_suffix(".txt")
+        truth = truth_path.read_text(encoding="utf-8") if truth_path.exists() else None
+
+        with Image.open(path) as img:
+            img.load()
+
+            started = time.perf_counter()
+            raw_text = pytesseract.image_to_string(img, lang=LANG).strip()
+            raw_s = time.perf_counter() - started
+
+            started = time.perf_counter()
+            text_found = has_text(img)
+            gate_s = time.perf_counter() - started
+            new_text = ''
+            if text_found:
+                new_text = pytesseract.image_to_string(preprocess_for_ocr(img), lang=LANG).strip()
+            new_s = time.perf_counter() - started
+
+        reference = truth if truth is not None else raw_text
+        rows.append({
+            "image": path.name,
+            "size": list(img.size),
+            "has_truth": truth is not None,
+            "gate_text_found": text_found,
+            "truth_has_text": bool(normalize(truth)) if truth is not None else None,
+            "raw_s": round(raw_s, 3),
+            "gate_s": round(gate_s, 4),
+            "new_s": round(new_s, 3),
+            "raw_acc": round(similarity(raw_text, reference), 3) if truth is not None else None,
+            "new_acc": round(similarity(new_text, reference), 3),
+        })
+        print(f"{path.name:<40} raw {raw_s:6.2f}s  new {new_s:6.2f}s  "
+              f"текст={'да' if text_found else 'нет'}  acc {rows[-1]['raw_acc']} → {rows[-1]['new_acc']}")
+    return rows
+
+
+def summarize(rows):
+    if not rows:
+        return {}
+    with_truth = [r for r in rows if r["has_truth"]]
+    gate_checked = [r for r in with_truth if r["truth_has_text"] is not None]
+    return {
+        "images": len(rows),
+        "raw_total_s": round(sum(r["raw_s"] for r in rows), 2),
+        "new_total_s": round(sum(r["new_s"] for r in rows), 2),
+        "raw_median_s": round(statistics.median(r["raw_s"] for r in rows), 3),
+        "new_median_s": round(statistics.median(r["new_s"] for r in rows), 3),
+        "skipped_by_gate": sum(1 for r in rows if not r["gate_text_found"]),
+        # текст был, а детектор его не увидел — самая дорогая ошибка
+        "gate_missed_text": sum(1 for r in gate_checked if r["truth_has_text"] and not r["gate_text_found"]),
+        "raw_mean_acc": round(statistics.mean(r["raw_acc"] for r in with_truth), 3) if with_truth else None,
+        "new_mean_acc": round(statistics.mean(r["new_acc"] for r in with_truth), 3) if with_truth else None,
+        "new_vs_raw_agreement": round(statistics.mean(r["new_acc"] for r in rows if not r["has_truth"]), 3)
+        if len(with_truth) < len(rows) else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", type=Path)
+    parser.add_argument("--out", type=Path, default=Path("bench_ocr.json"))
+    args = parser.parse_args()
+
+    rows = run(args.corpus)
+    summary = summarize(rows)
+    print(f"\n📊 {json.dumps(summary, ensure_ascii=False)}")
+    args.out.write_text(json.dumps({"summary": summary, "images": rows}, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"💾 Результаты: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
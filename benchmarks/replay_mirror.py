@@ -0,0 +1,267 @@
+"""
+Нагрузочный replay пайплайна mirror.py без Telegram и OpenAI.
+
+Корпус пишет сам бот: MIRROR_RECORD_PATH=mirror_corpus.jsonl в .env (см. telegram_bot/recorder.py).
+Сообщения идут через ту же очередь задач, планировщик, воркеры и стадии, что и в проде.
+OpenAI и Bot API заменены локальным HTTP-сервером с настраиваемой задержкой. Все базы
+(дедуп, кэш GPT, очередь) создаются во временной папке, поэтому кэш не подменяет запросы.
+
+    python -m benchmarks.replay_mirror mirror_corpus.jsonl [--speedup 10|max] [--llm-latency 0.8]
+        [--bot-latency 0.15] [--casting-rate 0.6] [--workers 4] [--out bench_replay.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+BOT_TOKEN = "replay"
+DEST_CHAT_ID = -100
+DRAIN_POLL_SECONDS = 0.5
+
+
+# --- локальные заглушки OpenAI и Bot API ------------------------------------
+
+class StandIn:
+    def __init__(self, llm_latency: float, bot_latency: float, casting_rate: float):
+        self.llm_latency = llm_latency
+        self.bot_latency = bot_latency
+        self.casting_rate = casting_rate
+        self.llm_calls = 0
+        self.bot_calls = 0
+        self._lock = threading.Lock()
+
+    def is_casting(self, prompt: str) -> bool:
+        # детерминированно по тексту: один и тот же корпус даёт одинаковую долю кастингов
+        return zlib.crc32(prompt.encode("utf-8")) % 1000 < self.casting_rate * 1000
+
+    def chat_completion(self, request: dict) -> dict:
+        content = request["messages"][0]["content"]
+        prompt = content if isinstance(content, str) else next(
+            (part["text"] for part in content if part.get("type") == "text"), "")
+        casting = self.is_casting(prompt)
+
+        if request.get("response_format"):
+            fields = request["response_format"]["json_schema"]["schema"]["properties"]
+            answer = json.dumps({key: (casting if key == "is_casting" else "-") for key in fields}, ensure_ascii=False)
+        elif request.get("max_tokens") == 5:
+            answer = "да" if casting else "нет"
+        else:
+            answer = "🎨 Проект: replay\n👤 Роль/Типаж: -\n🗓 Дата съёмок: -\n⏰ Время: -\n" \
+                     "💰 Гонорар: -\n📍 Локация: -\n📬 Контакт: -\n📝 Доп. информация: -"
+
+        return {
+            "id": "chatcmpl-replay",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "gpt-4o-mini"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": answer, "refusal": None},
+                "finish_reason": "stop",
+                "logprobs": None,
+            }],
+            "usage": {
+                "prompt_tokens": len(prompt) // 4,
+                "completion_tokens": len(answer) // 4,
+                "total_tokens": (len(prompt) + len(answer)) // 4,
+            },
+        }
+
+    def serve(self) -> ThreadingHTTPServer:
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if self.path.endswith("/chat/completions"):
+                    time.sleep(stand_in.llm_latency)
+                    with stand_in._lock:
+                        stand_in.llm_calls += 1
+                    payload = stand_in.chat_completion(json.loads(body))
+                elif self.path.startswith(f"/bot{BOT_TOKEN}/"):
+                    time.sleep(stand_in.bot_latency)
+                    with stand_in._lock:
+                        stand_in.bot_calls += 1
+                    payload = {"ok": True, "result": {"message_id": stand_in.bot_calls}}
+                else:
+                    self.send_error(404)
+                    return
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def configure_env(workdir: str, base_url: str, workers: int, chat_interval: float):
+    # До импорта пайплайна: модули читают настройки из окружения при импорте
+    os.environ.update({
+        "OPENAI_API_KEY": "replay",
+        "OPENAI_BASE_URL": f"{base_url}/v1",
+        "TELEGRAM_API_URL": base_url,
+        "DEDUP_DB_PATH": os.path.join(workdir, "seen_castings.db"),
+        "LLM_CACHE_PATH": os.path.join(workdir, "llm_cache.db"),
+        "JOB_QUEUE_PATH": os.path.join(workdir, "mirror_jobs.db"),
+        "PUBLISH_CHAT_INTERVAL": str(chat_interval),
+        "MIRROR_WORKERS": str(workers),
+        "METRICS_PORT": "0",
+        "METRICS_SNAPSHOT_PATH": "",
+        "MIRROR_RECORD_PATH": "",
+    })
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+# --- replay -----------------------------------------------------------------
+
+async def replay(entries, speedup, workers, llm_mode):
+    from shared.job_queue import get_queue
+    from telegram_bot.recorder import ReplayMessage
+    from telegram_bot.scheduler import SourceScheduler
+    from telegram_bot.stages import build_pipeline
+    from telegram_bot.publisher import get_publisher
+    from telegram_bot.worker import run_worker
+
+    messages = {(e["chat_id"], e["message_id"]): ReplayMessage(e) for e in entries}
+    # все источники корпуса считаем отслеживаемыми: фильтр тем уже отработал при записи
+    config = {
+        "source_threads": set(),
+        "source_without_topic": sorted({e["chat_id"] for e in entries}),
+        "bot_token": BOT_TOKEN,
+        "chat_id": DEST_CHAT_ID,
+        "thread_id": None,
+        "llm_mode": llm_mode,
+    }
+    jobs = get_queue()
+    pipeline = build_pipeline(report_every=0)
+    scheduler = SourceScheduler(jobs, {})
+    wake = asyncio.Event()
+    latencies, published = [], 0
+    finished = asyncio.Event()
+
+    async def fetch(chat_id, message_id):
+        return messages.get((chat_id, message_id))
+
+    def on_done(job, ok):
+        nonlocal published
+        latencies.append(time.time() - job.enqueued_at)
+        published += bool(ok)
+        if len(latencies) >= len(messages):
+            finished.set()
+
+    tasks = [asyncio.create_task(run_worker(n, jobs, scheduler, pipeline, fetch, config, wake, on_done))
+             for n in range(workers)]
+
+    started = time.time()
+    first_ts = entries[0]["ts"] if entries else 0
+    for entry in entries:
+        if speedup:
+            delay = (entry["ts"] - first_ts) / speedup - (time.time() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        if jobs.enqueue(entry["chat_id"], entry["message_id"]):
+            wake.set()
+    # Сброшенные планировщиком (shed) и упавшие по аренде задачи до on_done не доходят —
+    # поэтому кроме счётчика ждём, пока очередь опустеет
+    while not finished.is_set() and jobs.depth() > 0:
+        try:
+            await asyncio.wait_for(finished.wait(), timeout=DRAIN_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+    elapsed = time.time() - started
+
+    for task in tasks:
+        task.cancel()
+    publisher = get_publisher(BOT_TOKEN)
+    publisher_stats = publisher.stats()
+    await publisher.aclose()
+
+    return {
+        "messages": len(latencies),
+        "published": published,
+        # shed или FAILED по аренде — обработка не завершилась
+        "not_finished": len(messages) - len(latencies),
+        "elapsed_s": round(elapsed, 2),
+        "msgs_per_s": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "e2e_p50_s": round(percentile(latencies, 0.50), 3),
+        "e2e_p95_s": round(percentile(latencies, 0.95), 3),
+        "e2e_p99_s": round(percentile(latencies, 0.99), 3),
+        "e2e_mean_s": round(statistics.mean(latencies), 3) if latencies else 0.0,
+        "stages": pipeline.stats(),
+        "publisher": publisher_stats,
+        "sources": {str(k): v for k, v in scheduler.stats().items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", type=Path)
+    parser.add_argument("--speedup", default="max", help="1, 10, ... или max (без пауз между сообщениями)")
+    parser.add_argument("--llm-latency", type=float, default=0.8, help="задержка ответа заглушки OpenAI, с")
+    parser.add_argument("--bot-latency", type=float, default=0.15, help="задержка ответа заглушки Bot API, с")
+    parser.add_argument("--casting-rate", type=float, default=0.6, help="доля сообщений, которые «GPT» назовёт кастингом")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("MIRROR_WORKERS", "4")))
+    parser.add_argument("--chat-interval", type=float, default=0.0,
+                        help="пауза между публикациями в чат (в проде 3с; 0 — меряем сам пайплайн)")
+    parser.add_argument("--llm-mode", choices=["separate", "combined"], default=os.getenv("LLM_MODE", "separate"))
+    parser.add_argument("--out", type=Path, default=Path("bench_replay.json"))
+    args = parser.parse_args()
+
+    speedup = 0.0 if args.speedup == "max" else float(args.speedup)
+    stand_in = StandIn(args.llm_latency, args.bot_latency, args.casting_rate)
+    server = stand_in.serve()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    with tempfile.TemporaryDirectory(prefix="replay_") as workdir:
+        configure_env(workdir, base_url, args.workers, args.chat_interval)
+        from telegram_bot.recorder import load_corpus
+        entries = load_corpus(str(args.corpus))
+        if not entries:
+            print("⚠️ Корпус пуст")
+            return
+        print(f"▶️ Replay: {len(entries)} сообщений, ускорение {args.speedup}, воркеров {args.workers}")
+        result = asyncio.run(replay(entries, speedup, args.workers, args.llm_mode))
+
+    result.update({
+        "speedup": args.speedup,
+        "workers": args.workers,
+        "llm_latency_s": args.llm_latency,
+        "bot_latency_s": args.bot_latency,
+        "llm_calls": stand_in.llm_calls,
+        "bot_calls": stand_in.bot_calls,
+    })
+    server.shutdown()
+    print(f"\n📊 {result['messages']} сообщений за {result['elapsed_s']}s — {result['msgs_per_s']} msg/s, "
+          f"e2e p50 {result['e2e_p50_s']}s p95 {result['e2e_p95_s']}s p99 {result['e2e_p99_s']}s, "
+          f"опубликовано {result['published']}, не завершено {result['not_finished']}, "
+          f"запросов GPT {result['llm_calls']}")
+    args.out.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"💾 Результаты: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Склейка альбомов: Telegram присылает каждую часть альбома отдельным NewMessage с общим grouped_id.
+Собираем части ALBUM_WAIT_SECONDS после последней и обрабатываем альбом ровно один раз.
+"""
+
+import asyncio
+import os
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+ALBUM_WAIT_SECONDS = float(os.getenv("ALBUM_WAIT_SECONDS", "1.5"))
+# сколько уже обработанных альбомов помним, чтобы опоздавшие части не запустили повторную рассылку
+DONE_MEMORY = 1000
+
+
+class AlbumCollector:
+    def __init__(self, process: Callable[[List], Awaitable[None]], wait: float = ALBUM_WAIT_SECONDS):
+        self.process = process
+        self.wait = wait
+        self._parts: Dict[Tuple[int, int], List] = {}
+        self._timers: Dict[Tuple[int, int], asyncio.Task] = {}
+        self._done: "OrderedDict[Tuple[int, int], None]" = OrderedDict()
+
+    async def add(self, msg):
+        """
+        Одиночное сообщение обрабатывается сразу, часть альбома — после паузы, вместе с остальными.
+        """
+        grouped_id = getattr(msg, "grouped_id", None)
+        if not grouped_id:
+            await self.process([msg])
+            return
+
+        key = (msg.chat_id, grouped_id)
+        if key in self._done:
+            print(f"🔁 Опоздавшая часть альбома {grouped_id} — уже обработан, пропускаем.")
+            return
+
+        self._parts.setdefault(key, []).append(msg)
+        timer = self._timers.get(key)
+        if timer:
+            timer.cancel()
+        self._timers[key] = asyncio.create_task(self._flush_later(key))
+
+    async def _flush_later(self, key):
+        try:
+            await asyncio.sleep(self.wait)
+        except asyncio.CancelledError:
+            return  # пришла ещё часть — таймер перезапущен
+
+        self._timers.pop(key, None)
+        messages = sorted(self._parts.pop(key, []), key=lambda m: m.id)
+        self._done[key] = None
+        while len(self._done) > DONE_MEMORY:
+            self._done.popitem(last=False)
+
+        print(f"🖼️ Альбом {key[1]}: {len(messages)} частей — обрабатываем один раз.")
+        try:
+            await self.process(messages)
+        except Exception as e:
+            print(f"❌ Ошибка обработки альбома {key[1]}: {e}")
@@ -0,0 +1,109 @@
+"""
+Рассылка кастинга подошедшим актёрам: параллельно, но в рамках лимитов Telegram.
+
+- не больше DELIVERY_CONCURRENCY отправок одновременно;
+- общий token bucket на аккаунт бота (DELIVERY_RATE сообщений в секунду, Telegram даёт ~30);
+- FloodWaitError не роняет рассылку: все воркеры засыпают на e.seconds и повторяют;
+- по каждому кастингу печатаем перцентили задержки доставки.
+"""
+
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List
+
+from telethon.errors import FloodWaitError
+
+DELIVERY_CONCURRENCY = int(os.getenv("DELIVERY_CONCURRENCY", "8"))
+DELIVERY_RATE = float(os.getenv("DELIVERY_RATE", "25"))
+DELIVERY_MAX_RETRIES = int(os.getenv("DELIVERY_MAX_RETRIES", "3"))
+
+
+class TokenBucket:
+    """
+    rate токенов в секунду, не больше capacity подряд. pause() блокирует всех до указанного момента.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100
+    lo, hi = int(k), min(int(k) + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+class DeliveryScheduler:
+    def __init__(self, concurrency: int = DELIVERY_CONCURRENCY, rate: float = DELIVERY_RATE,
+                 max_retries: int = DELIVERY_MAX_RETRIES):
+        self.bucket = TokenBucket(rate)
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.max_retries = max_retries
+
+    async def _deliver_one(self, user_id: int, send: Callable[[int, Callable], Awaitable[None]],
+                           started: float, latencies: List[float]) -> bool:
+        async with self.semaphore:
+            for attempt in range(1, self.max_retries + 1):
+                try:
+                    # send сам решает, сколько API-вызовов сделать (пересылка, фоллбэки);
+                    # перед каждым он ждёт токен через переданный acquire
+                    await send(user_id, self.bucket.acquire)
+                    latencies.append(time.monotonic() - started)
+                    return True
+                except FloodWaitError as e:
+                    print(f"⏳ FloodWait {e.seconds}s (пользователь {user_id}, попытка {attempt}) — ждём")
+                    self.bucket.pause(e.seconds + 1)
+                except Exception as e:
+                    print(f"⚠️ Не удалось доставить пользователю {user_id}: {e}")
+                    return False
+            print(f"⚠️ Пользователь {user_id}: исчерпаны попытки после FloodWait")
+            return False
+
+    async def deliver(self, user_ids: Iterable[int], send: Callable[[int, Callable], Awaitable[None]],
+                      label: str = "кастинг") -> Dict[str, float]:
+        """
+        Рассылает всем user_ids через send(user_id, acquire). Возвращает сводку по доставке.
+        """
+        user_ids = list(user_ids)
+        started = time.monotonic()
+        latencies: List[float] = []
+        results = await asyncio.gather(
+            *(self._deliver_one(uid, send, started, latencies) for uid in user_ids)
+        )
+        report = {
+            "recipients": len(user_ids),
+            "delivered": sum(results),
+            "failed": len(results) - sum(results),
+            "total_s": round(time.monotonic() - started, 2),
+            "p50_s": round(percentile(latencies, 50), 2),
+            "p90_s": round(percentile(latencies, 90), 2),
+            "p99_s": round(percentile(latencies, 99), 2),
+        }
+        print(f"📦 Доставка ({label}): {report}")
+        return report
@@ -0,0 +1,60 @@
+"""
+Медиа одного кастинга для фоллбэк-рассылки: скачиваем один раз в память, загружаем один раз,
+дальше всем получателям отправляем уже загруженный в Telegram файл (без повторного аплоада).
+"""
+
+import asyncio
+from typing import Optional
+
+
+class CastingMedia:
+    def __init__(self, client, message):
+        self.client = client
+        self.message = message
+        self._lock = asyncio.Lock()
+        self._file = None           # сначала загруженный InputFile, после первой отправки — её media
+        self._reusable = False      # _file уже media отправленного сообщения (file reference)
+        self._failed = False        # скачать/загрузить не вышло — не пытаемся для каждого получателя
+
+    async def _upload(self) -> Optional[object]:
+        data = await self.client.download_media(self.message, file=bytes)
+        if not data:
+            return None
+        ext = getattr(getattr(self.message, "file", None), "ext", None) or ".jpg"
+        print(f"⬇️ Медиа кастинга скачано один раз: {len(data)} bytes")
+        return await self.client.upload_file(data, file_name=f"casting{ext}")
+
+    async def send(self, user_id: int, caption: str) -> bool:
+        """
+        Отправляет медиа с подписью. False — медиа нет или его не удалось получить (нужен текстовый фоллбэк).
+        """
+        if self._failed or self.message is None or not self.message.media:
+            return False
+
+        if not self._reusable:
+            async with self._lock:
+                # первый получатель скачивает и загружает, остальные ждут готовый file reference
+                if not self._reusable:
+                    if self._failed:
+                        return False
+                    if self._file is None:
+                        try:
+                            self._file = await self._upload()
+                        except Exception as e:
+                            print(f"⚠️ Не удалось скачать/загрузить медиа кастинга: {e}")
+                        if self._file is None:
+                            self._failed = True
+                            return False
+                    sent = await self.client.send_file(user_id, self._file, caption=caption)
+                    self._file = sent.media
+                    self._reusable = True
+                    return True
+
+        await self.client.send_file(user_id, self._file, caption=caption)
+        return True
+
+    def close(self):
+        # 🧹 Рассылка закончена — отпускаем ссылки на медиа
+        self._file = None
+        self._reusable = False
+        self.message = None
@@ -1,8 +1,14 @@
 from telethon import TelegramClient, events
-import os, json, tempfile
+from telethon.errors import FloodWaitError
+import os
 from dotenv import load_dotenv
 from pathlib import Path
-from utils import match_profile_with_casting
+from utils import match_profiles_batch
+from album_collector import AlbumCollector
+from delivery import DeliveryScheduler
+from media_cache import CastingMedia
+from profile_source import ProfileSource
+from profile_store import extract_requirements
 
 # env
 env_path = Path(__file__).resolve().parent.parent / "telegram_bot" / ".env"
@@ -14,7 +20,11 @@ bot_token = os.getenv("BOT_TOKEN")
 
 client = TelegramClient("personal_matcher_session", api_id, api_hash).start(bot_token=bot_token)
 
-DB_PATH = os.path.join(os.path.dirname(__file__), "users.json")
+# Анкеты из data/actors.db с кэшем в памяти
+profiles = ProfileSource()
+
+# Рассылка в ЛС с лимитами Telegram
+scheduler = DeliveryScheduler()
 
 # 👉 ЗАДАЙ свои значения тут
 TARGET_CHAT_ID = -1002835970298          # твоя группа с форумами
@@ -39,6 +49,68 @@ def get_topic_id(msg):
     return None
 
 
+async def select_matches(casting_text, store):
+    """
+    Префильтр по колонкам профилей: отсекаем явно неподходящих,
+    уверенные совпадения берём без GPT, остальных кандидатов проверяем через GPT пачками.
+    Возвращает список user_id.
+    """
+    req = extract_requirements(casting_text)
+    candidate, confident = store.match(req)
+
+    matched = store.ids(confident)
+    to_check = store.ids(candidate & ~confident)
+    print(f"🧮 Требования: {req} | профилей: {len(store)}, кандидатов: {int(candidate.sum())}, "
+          f"без GPT: {len(matched)}, в GPT: {len(to_check)}")
+
+    if to_check:
+        matched += await match_profiles_batch(casting_text, {uid: store.profiles[uid] for uid in to_check})
+    return matched
+
+
+def make_sender(messages, casting_text, media):
+    """
+    Возвращает send(user_id, acquire) для планировщика: пересылка оригинала,
+    при неудаче — файл с подписью (media: CastingMedia, общий на весь кастинг), в крайнем случае — текст.
+    acquire() ждёт токен перед каждым API-вызовом, FloodWaitError пробрасываем планировщику.
+    """
+    caption = f"🎯 Найден подходящий кастинг для вас!\n\n{casting_text}"
+    first = messages[0]
+
+    async def send(user_id, acquire):
+        # 1) Всегда пытаемся переслать оригинал (с медиа или без, альбом — целиком)
+        try:
+            await acquire()
+            await client.forward_messages(int(user_id), messages if len(messages) > 1 else first)
+            print(f"📬 Переслано (оригинал) пользователю {user_id}")
+            return
+        except FloodWaitError:
+            raise
+        except Exception as e:
+            print(f"⚠️ Не удалось переслать оригинал: {e}")
+
+        # 2) Фоллбэк: медиа (скачано и загружено один раз на кастинг) с подписью
+        try:
+            await acquire()
+            if await media.send(int(user_id), caption):
+                print(f"📬 Отправлено (файл+подпись) пользователю {user_id}")
+            else:
+                # 3) Если медиа нет/не скачалось — отправляем текст
+                await client.send_message(int(user_id), caption)
+                print(f"📬 Отправлено (текст) пользователю {user_id}")
+
+        except FloodWaitError:
+            raise
+        except Exception as e:
+            print(f"⚠️ Ошибка при фоллбэке пользователю {user_id}: {e}")
+            # Последняя попытка — текст
+            await acquire()
+            await client.send_message(int(user_id), caption)
+            print(f"📬 (fallback2) Отправлено (текст) пользователю {user_id}")
+
+    return send
+
+
 @client.on(events.NewMessage(chats=[TARGET_CHAT_ID]))
 async def handle_new_casting(event):
     print("📥 Получено новое сообщение...")
@@ -61,139 +133,43 @@ async def handle_new_casting(event):
         print("❌ Не та ветка. Пропускаем.")
         return
 
-    casting_text = event.raw_text or ""
+    # Части альбома копятся по grouped_id, обычное сообщение идёт сразу
+    await albums.add(msg)
+
+
+async def process_casting(messages):
+    """
+    Один логический кастинг (одно сообщение или весь альбом): матчинг и рассылка ровно один раз.
+    """
+    first = messages[0]
+    # у альбома подпись обычно только у одной части
+    casting_text = next((m.raw_text for m in messages if (m.raw_text or "").strip()), "")
     if not casting_text.strip():
         print("⚠️ Пустой текст — пропускаем.")
         return
 
-    # Загружаем профили
-    try:
-        with open(DB_PATH, "r", encoding="utf-8") as f:
-            users = json.load(f)
-        print(f"✅ Загружено профилей: {len(users)}")
-    except Exception as e:
-        print(f"❌ Ошибка чтения users.json: {e}")
-        return
-
-    if not users:
+    # Профили (из кэша; база перечитывается только если менялась)
+    store = profiles.get_store()
+    if not len(store):
         print("⚠️ В базе нет пользователей.")
         return
 
     # Матчинг и отправка в ЛС
-    matched_any = False
-    for user_id, profile in users.items():
+    matched = await select_matches(casting_text, store)
+    if matched:
+        label = f"альбом {first.grouped_id}" if len(messages) > 1 else f"msg {first.id}"
+        media = CastingMedia(client, first)
         try:
-            if not match_profile_with_casting(casting_text, profile):
-                continue
-
-            matched_any = True
-
-            # 1) Всегда пытаемся переслать оригинал (с медиа или без)
-            try:
-                await client.forward_messages(int(user_id), msg)
-                print(f"📬 Переслано (оригинал) пользователю {user_id}")
-                continue  # успех — к следующему пользователю
-            except Exception as e:
-                print(f"⚠️ Не удалось переслать оригинал: {e}")
-
-            # 2) Фоллбэк: если есть медиа — скачать и отправить как файл с подписью
-            tmp_path = None
-            try:
-                if msg.media:
-                    tmp_dir = tempfile.gettempdir()
-                    tmp_path = await client.download_media(msg, file=tmp_dir)
-
-                    if tmp_path and os.path.exists(tmp_path):
-                        await client.send_file(
-                            int(user_id),
-                            tmp_path,
-                            caption=f"🎯 Найден подходящий кастинг для вас!\n\n{casting_text}"
-                        )
-                        print(f"📬 Отправлено (файл+подпись) пользователю {user_id}")
-                    else:
-                        # 3) Если медиа нет/не скачалось — отправляем текст
-                        await client.send_message(int(user_id), f"🎯 Найден подходящий кастинг для вас!\n\n{casting_text}")
-                        print(f"📬 Отправлено (текст) пользователю {user_id}")
-                else:
-                    # медиа нет — текст
-                    await client.send_message(int(user_id), f"🎯 Найден подходящий кастинг для вас!\n\n{casting_text}")
-                    print(f"📬 Отправлено (текст) пользователю {user_id}")
-
-            except Exception as e:
-                print(f"⚠️ Ошибка при фоллбэке пользователю {user_id}: {e}")
-                # Последняя попытка — текст
-                try:
-                    await client.send_message(int(user_id), f"🎯 Найден подходящий кастинг для вас!\n\n{casting_text}")
-                    print(f"📬 (fallback2) Отправлено (текст) пользователю {user_id}")
-                except Exception as e2:
-                    print(f"⚠️ Ошибка при отправке текста пользователю {user_id}: {e2}")
-            finally:
-                try:
-                    if tmp_path and os.path.exists(tmp_path):
-                        os.remove(tmp_path)
-                except Exception:
-                    pass
-
-        except Exception as e:
-            print(f"⚠️ Ошибка при обработке пользователя {user_id}: {e}")
-
-    if not matched_any:
+            await scheduler.deliver(matched, make_sender(messages, casting_text, media), label=label)
+        finally:
+            media.close()
+    else:
         print("🔕 Никому не подошло (или все отфильтрованы).")
 
 
-# Дополнительный хэндлер для альбомов (несколько фото/медиа одним постом)
-@client.on(events.Album(chats=[TARGET_CHAT_ID]))
-async def handle_album(event):
-    # Проверяем ветку по первому сообщению альбома
-    msg0 = event.messages[0]
-    topic_id = get_topic_id(msg0)
-    if topic_id != TARGET_THREAD_ID:
-        return
-
-    casting_text = (msg0.raw_text or "").strip()
-
-    # Юзеры
-    try:
-        with open(DB_PATH, "r", encoding="utf-8") as f:
-            users = json.load(f)
-    except Exception as e:
-        print(f"❌ Ошибка чтения users.json (альбом): {e}")
-        return
-
-    for user_id, profile in users.items():
-        try:
-            if not match_profile_with_casting(casting_text, profile):
-                continue
-
-            # 1) пробуем переслать альбом целиком
-            try:
-                await client.forward_messages(int(user_id), event.messages)
-                print(f"📬 Переслан альбом пользователю {user_id}")
-                continue
-            except Exception as e:
-                print(f"⚠️ Не удалось переслать альбом: {e}")
-
-            # 2) фоллбэк — отправим первое медиа с подписью
-            tmp_path = None
-            try:
-                tmp_path = await client.download_media(event.messages[0])
-                if tmp_path and os.path.exists(tmp_path):
-                    await client.send_file(int(user_id), tmp_path, caption=f"🎯 Найден подходящий кастинг для вас!\n\n{casting_text}")
-                    print(f"📬 Отправлено (первый файл альбома) пользователю {user_id}")
-                else:
-                    await client.send_message(int(user_id), f"🎯 Найден подходящий кастинг для вас!\n\n{casting_text}")
-            except Exception as e:
-                print(f"⚠️ Ошибка при фоллбэке альбома пользователю {user_id}: {e}")
-            finally:
-                try:
-                    if tmp_path and os.path.exists(tmp_path):
-                        os.remove(tmp_path)
-                except Exception:
-                    pass
-
-        except Exception as e:
-            print(f"⚠️ Ошибка при обработке пользователя (альбом) {user_id}: {e}")
+albums = AlbumCollector(process_casting)
 
 
+profiles.get_store()  # прогреваем кэш анкет до первого кастинга
 print("🤖 Бот персонального подбора запущен и ожидает новые кастинги...")
 client.run_until_disconnected()
\ No newline at end of file
@@ -0,0 +1,103 @@
+"""
+Профили актёров из data/actors.db (таблица users, её пишет user_reg_bot.upsert_user) с кэшем в памяти.
+
+Никакого чтения с диска на каждое сообщение: раз в REFRESH_SECONDS проверяем PRAGMA data_version
+и mtime файла, и только если база менялась — догружаем строки с updated_at новее последней виденной.
+"""
+
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from profile_store import ProfileStore
+
+DB_PATH = Path(__file__).resolve().parents[1] / "data" / "actors.db"
+REFRESH_SECONDS = float(os.getenv("PROFILES_REFRESH_SECONDS", "2"))
+
+# Колонки, нужные для матчинга (телефоны, ссылки и фото в память не тянем)
+PROFILE_COLUMNS = ("sex", "cities", "age_range", "look_type", "body_type", "height_cm")
+
+
+class ProfileSource:
+    def __init__(self, db_path: Path = DB_PATH, refresh_seconds: float = REFRESH_SECONDS):
+        self.db_path = str(db_path)
+        self.refresh_seconds = refresh_seconds
+        self.users: Dict[int, Dict[str, Any]] = {}
+        self.store: Optional[ProfileStore] = None
+        self._con: Optional[sqlite3.Connection] = None
+        self._data_version = None
+        self._mtime = None
+        self._last_updated_at = ""
+        self._last_check = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._con is None:
+            # read-only: матчер никогда не пишет в базу анкет
+            self._con = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+            self._con.row_factory = sqlite3.Row
+        return self._con
+
+    def _changed(self) -> bool:
+        try:
+            mtime = os.path.getmtime(self.db_path)
+        except OSError:
+            return False
+        if mtime != self._mtime:
+            # файл заменили/пересоздали — переоткрываем соединение
+            if self._con is not None:
+                self._con.close()
+                self._con = None
+            self._mtime = mtime
+            self._data_version = None
+        version = self._connect().execute("PRAGMA data_version").fetchone()[0]
+        if version != self._data_version:
+            self._data_version = version
+            return True
+        return False
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Догружает новые/изменённые анкеты. Возвращает True, если кэш обновился.
+        """
+        now = time.monotonic()
+        if not force and now - self._last_check < self.refresh_seconds:
+            return False
+        self._last_check = now
+        if not self._changed() and not force and self.store is not None:
+            return False
+
+        cols = ", ".join(PROFILE_COLUMNS)
+        con = self._connect()
+        rows = con.execute(
+            f"SELECT user_id, {cols}, COALESCE(updated_at, '') AS updated_at FROM users "
+            f"WHERE COALESCE(updated_at, '') > ? ORDER BY updated_at",
+            (self._last_updated_at,),
+        ).fetchall()
+        total = con.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+        for row in rows:
+            self.users[row["user_id"]] = {c: row[c] for c in PROFILE_COLUMNS}
+            self._last_updated_at = max(self._last_updated_at, row["updated_at"])
+
+        if total < len(self.users):
+            # кого-то удалили — перечитываем целиком
+            self.users.clear()
+            self._last_updated_at = ""
+            return self.refresh(force=True)
+
+        if rows or self.store is None:
+            self.store = ProfileStore.from_profiles(self.users)
+            print(f"🔄 Профили обновлены: +{len(rows)}, всего {len(self.users)}")
+            return True
+        return False
+
+    def get_store(self) -> ProfileStore:
+        try:
+            self.refresh()
+        except sqlite3.Error as e:
+            print(f"❌ Ошибка чтения {self.db_path}: {e}")
+            if self.store is None:
+                self.store = ProfileStore.from_profiles({})
+        return self.store
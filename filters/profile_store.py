@@ -0,0 +1,224 @@
+"""
+Колоночное хранилище профилей актёров для быстрого префильтра перед GPT.
+
+Каждый признак — отдельный NumPy-массив (пол, города битовой маской, рост, игровой возраст),
+требования кастинга превращаются в булевы маски, и в GPT уходят только выжившие кандидаты.
+"""
+
+import re
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+SEX_UNKNOWN, SEX_MALE, SEX_FEMALE = 0, 1, 2
+
+# Канонические города → корни (regex), по которым ищем их в начале слова (до 64 штук — влезают в битовую маску int64)
+CITIES = {
+    "алматы": ("алматы", "алма-ата", "almaty"),
+    "астана": ("астана", "астане", "нур-султан", "astana"),
+    "шымкент": ("шымкент", "shymkent"),
+    "караганда": ("караганд",),
+    "актобе": ("актобе",),
+    "атырау": ("атырау",),
+    "актау": ("актау",),
+    "павлодар": ("павлодар",),
+    "усть-каменогорск": ("усть-каменогорск", "өскемен", "оскемен"),
+    "семей": (r"семей\b", r"семе[ея]\b", "семипалатинск"),
+    "тараз": ("тараз",),
+    "костанай": ("костана", "қостанай"),
+    "кызылорда": ("кызылорд", "қызылорда"),
+    "уральск": ("уральск", r"орал(?:да|ға|дан)?\b"),
+    "петропавловск": ("петропавловск",),
+    "туркестан": ("туркестан",),
+    "талдыкорган": ("талдыкорган",),
+    "темиртау": ("темиртау",),
+    "экибастуз": ("экибастуз",),
+    "москва": ("москв",),
+    "ташкент": ("ташкент",),
+    "бишкек": ("бишкек",),
+}
+CITY_BITS = {name: 1 << i for i, name in enumerate(CITIES)}
+CITY_RES = {name: re.compile(r"\b(?:" + "|".join(stems) + ")") for name, stems in CITIES.items()}
+# Совпадают с обычными словами («несколько семей», «орал») — в тексте кастинга считаем городом,
+# только если написано с заглавной. В анкете (список городов) — как есть.
+AMBIGUOUS_CITY_WORDS = {"семей", "орал"}
+
+# «актёры», «актёров», «актёрский» — про актёров любого пола, поэтому из мужских слов только
+# единственное число («ищем актёра»). Нет явно мужского или женского слова — пол не ограничиваем.
+FEMALE_RE = re.compile(r"\b(?:девушк|женщин|актрис|мам[аы]\b|бабушк|девочк|жена\b|невест)")
+MALE_RE = re.compile(r"\b(?:парн|парен|мужчин|акт[её]р(?:а|у|ом|е)?\b|пап[аы]\b|дедушк|мальчик|муж\b|жених)")
+# «актёры и актрисы», «актрис и актёров» — нужны оба пола
+BOTH_SEXES_RE = re.compile(r"\bакт[её]р\w*\s+и\s+актрис|\bактрис\w*\s+и\s+акт[её]р")
+AGE_RANGE_RE = re.compile(r"(?:от\s*)?(\d{1,2})\s*(?:[-–—]|до)\s*(\d{1,2})\s*(?:лет|год)")
+AGE_PLUS_RE = re.compile(r"(\d{1,2})\s*\+\s*(?:лет|год)?|(?:от|старше)\s*(\d{1,2})\s*(?:лет|год)")
+AGE_SINGLE_RE = re.compile(r"возраст\D{0,5}(\d{1,2})\b")
+HEIGHT_RANGE_RE = re.compile(r"рост\D{0,12}(\d{3})\s*(?:[-–—]|до)\s*(\d{3})")
+HEIGHT_MIN_RE = re.compile(r"рост\D{0,12}(?:от|выше|не ниже)\s*(\d{3})|рост\D{0,5}(\d{3})\s*\+")
+# Требования, которые правилами не проверить — при них решает GPT
+SUBJECTIVE_RE = re.compile(
+    r"типаж|внешност|телосложен|азиат|славян|европ|кавказ|худощав|полн|спортивн|"
+    r"волос|блонд|брюнет|рыж|татуир|язык|казахск|англ|вокал|танц|опыт"
+)
+
+
+def _sex_code(value: Any) -> int:
+    v = str(value or "").strip().lower()
+    if v.startswith(("жен", "f")):
+        return SEX_FEMALE
+    if v.startswith(("муж", "m")):
+        return SEX_MALE
+    return SEX_UNKNOWN
+
+
+def _city_mask(value: Any, free_text: bool = False) -> int:
+    """
+    free_text — value это текст кастинга, а не поле анкеты: неоднозначные слова нужны с заглавной.
+    """
+    raw = ", ".join(value) if isinstance(value, list) else str(value or "")
+    text = raw.lower()
+    mask = 0
+    for name, pattern in CITY_RES.items():
+        for m in pattern.finditer(text):
+            if free_text and m.group() in AMBIGUOUS_CITY_WORDS and not raw[m.start()].isupper():
+                continue
+            mask |= CITY_BITS[name]
+            break
+    return mask
+
+
+def _int(value: Any) -> int:
+    m = re.search(r"\d+", str(value or ""))
+    return int(m.group()) if m else 0
+
+
+def _age_range(value: Any) -> Tuple[int, int]:
+    nums = [int(n) for n in re.findall(r"\d{1,2}", str(value or ""))]
+    if not nums:
+        return 0, 0
+    return min(nums), max(nums)
+
+
+def extract_requirements(casting_text: str) -> Dict[str, Any]:
+    """
+    Достаёт из текста кастинга требования, которые проверяются правилами.
+    Поле None — требования нет (подходят все).
+    """
+    text = (casting_text or "").lower()
+
+    female, male = bool(FEMALE_RE.search(text)), bool(MALE_RE.search(text))
+    if BOTH_SEXES_RE.search(text):
+        female = male = True
+    sex = SEX_FEMALE if female and not male else SEX_MALE if male and not female else None
+
+    age = None
+    m = AGE_RANGE_RE.search(text)
+    if m:
+        a, b = int(m.group(1)), int(m.group(2))
+        age = (min(a, b), max(a, b))
+    else:
+        m = AGE_PLUS_RE.search(text)
+        if m:
+            age = (int(m.group(1) or m.group(2)), 99)
+        else:
+            m = AGE_SINGLE_RE.search(text)
+            if m:
+                age = (int(m.group(1)), int(m.group(1)))
+
+    height = None
+    m = HEIGHT_RANGE_RE.search(text)
+    if m:
+        height = (int(m.group(1)), int(m.group(2)))
+    else:
+        m = HEIGHT_MIN_RE.search(text)
+        if m:
+            height = (int(m.group(1) or m.group(2)), 250)
+
+    city_mask = _city_mask(casting_text or "", free_text=True)
+
+    return {
+        "sex": sex,
+        "age": age,
+        "height": height,
+        "city_mask": city_mask or None,
+        "subjective": bool(SUBJECTIVE_RE.search(text)),
+    }
+
+
+class ProfileStore:
+    """
+    Профили в виде колонок. Неизвестное значение = 0: такой профиль не отсекается,
+    но и уверенным совпадением не считается.
+    """
+
+    def __init__(self, user_ids: List[int], sex, city_mask, height, age_min, age_max, profiles: Dict[int, dict]):
+        self.user_ids = np.asarray(user_ids, dtype=np.int64)
+        self.sex = np.asarray(sex, dtype=np.int8)
+        self.city_mask = np.asarray(city_mask, dtype=np.int64)
+        self.height = np.asarray(height, dtype=np.int16)
+        self.age_min = np.asarray(age_min, dtype=np.int16)
+        self.age_max = np.asarray(age_max, dtype=np.int16)
+        self.profiles = profiles
+
+    @classmethod
+    def from_profiles(cls, users: Dict[Any, dict]) -> "ProfileStore":
+        """
+        users: {user_id: профиль}. Понимает и поля users.json (sex/age/height/location),
+        и поля таблицы users из actors.db (sex/age_range/height_cm/cities).
+        """
+        ids, sex, cities, height, age_min, age_max, profiles = [], [], [], [], [], [], {}
+        for user_id, p in users.items():
+            uid = int(user_id)
+            a_min, a_max = _age_range(p.get("age_range") or p.get("age"))
+            ids.append(uid)
+            sex.append(_sex_code(p.get("sex")))
+            cities.append(_city_mask(p.get("cities") or p.get("location")))
+            height.append(_int(p.get("height_cm") or p.get("height")))
+            age_min.append(a_min)
+            age_max.append(a_max)
+            profiles[uid] = p
+        return cls(ids, sex, cities, height, age_min, age_max, profiles)
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def match(self, req: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Возвращает (кандидаты, уверенные) — булевы маски по профилям.
+        Уверенные совпали по всем известным требованиям, и в кастинге нет субъективных требований.
+        """
+        n = len(self.user_ids)
+        candidate = np.ones(n, dtype=bool)
+        known = np.ones(n, dtype=bool)
+        constrained = 0
+
+        if req.get("sex") is not None:
+            constrained += 1
+            candidate &= (self.sex == req["sex"]) | (self.sex == SEX_UNKNOWN)
+            known &= self.sex != SEX_UNKNOWN
+
+        if req.get("city_mask"):
+            constrained += 1
+            candidate &= ((self.city_mask & req["city_mask"]) != 0) | (self.city_mask == 0)
+            known &= self.city_mask != 0
+
+        if req.get("age"):
+            constrained += 1
+            lo, hi = req["age"]
+            # пересечение игровых возрастов
+            candidate &= ((self.age_min <= hi) & (self.age_max >= lo)) | (self.age_max == 0)
+            known &= self.age_max != 0
+
+        if req.get("height"):
+            constrained += 1
+            lo, hi = req["height"]
+            candidate &= ((self.height >= lo) & (self.height <= hi)) | (self.height == 0)
+            known &= self.height != 0
+
+        if req.get("subjective") or constrained < 2:
+            confident = np.zeros(n, dtype=bool)
+        else:
+            confident = candidate & known
+        return candidate, confident
+
+    def ids(self, mask: np.ndarray) -> List[int]:
+        return [int(uid) for uid in self.user_ids[mask]]
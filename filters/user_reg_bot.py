@@ -17,11 +17,9 @@
 """
 
 import os
-import sqlite3
 import json
 from telethon import types
 import base64
-from datetime import datetime
 from pathlib import Path
 from typing import Dict, Any, Optional
 
@@ -30,6 +28,8 @@ from telethon import TelegramClient, events, Button
 from telethon.tl.custom.message import Message
 from telethon.errors import MessageIdInvalidError, MessageNotModifiedError
 
+from user_store import UserStore
+
 # --- ENV --------------------------------------------------------------------
 
 def _load_env():
@@ -69,55 +69,16 @@ MEDIA_ROOT = DATA_DIR / "user_media"
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 MEDIA_ROOT.mkdir(parents=True, exist_ok=True)
 
+# одно соединение с WAL, запросы — в отдельном потоке (см. user_store.py)
+users = UserStore(DB_PATH)
+
 def media_path(user_id: int, slot: int) -> Path:
     user_dir = MEDIA_ROOT / str(user_id)
     user_dir.mkdir(parents=True, exist_ok=True)
     return user_dir / f"photo{slot}.jpg"
 
-def init_db():
-    con = sqlite3.connect(DB_PATH)
-    cur = con.cursor()
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS users (
-            user_id INTEGER PRIMARY KEY,
-            full_name TEXT,
-            cities TEXT,
-            sex TEXT,
-            age_range TEXT,
-            look_type TEXT,
-            body_type TEXT,
-            height_cm INTEGER,
-            weight_kg INTEGER,
-            hair TEXT,
-            languages TEXT,
-            video_vizitka TEXT,
-            showreel TEXT,
-            portfolio TEXT,
-            projects TEXT,
-            phone TEXT,
-            instagram TEXT,
-            photo1_id TEXT,
-            photo2_id TEXT,
-            photo3_id TEXT,
-            photo4_id TEXT,
-            photo1_tg TEXT,
-            photo2_tg TEXT,
-            photo3_tg TEXT,
-            photo4_tg TEXT,
-            created_at TEXT,
-            updated_at TEXT
-        )
-        """
-    )
-    # миграция на случай старой базы
-    for col in ("photo1_tg","photo2_tg","photo3_tg","photo4_tg"):
-        try:
-            cur.execute(f"ALTER TABLE users ADD COLUMN {col} TEXT")
-        except Exception:
-            pass
-    con.commit()
-    con.close()
+async def init_db():
+    await users.init()
 
 def button_only(step: Dict[str, Any]) -> bool:
     # Любой шаг, где предполагается выбор по кнопкам
@@ -128,82 +89,15 @@ def button_only(step: Dict[str, Any]) -> bool:
         return True
     return False
 
-def upsert_user(user_id: int, data: Dict[str, Any]):
-    con = sqlite3.connect(DB_PATH)
-    cur = con.cursor()
-    now = datetime.utcnow().isoformat()
+async def upsert_user(user_id: int, data: Dict[str, Any]):
+    await users.upsert(user_id, data)
 
-    def _to_int(v):
-        try:
-            return int(str(v).strip())
-        except Exception:
-            return None
-
-    payload = {
-        "full_name":     data.get("full_name"),
-        "cities":        ", ".join(data["cities"]) if isinstance(data.get("cities"), list) else data.get("cities"),
-        "sex":           data.get("sex"),
-        "age_range":     data.get("age_range"),
-        "look_type":     data.get("look_type"),
-        "body_type":     data.get("body_type"),
-        "height_cm":     _to_int(data.get("height_cm")),
-        "weight_kg":     _to_int(data.get("weight_kg")),
-        "hair":          data.get("hair"),
-        "languages":     ", ".join(data["languages"]) if isinstance(data.get("languages"), list) else data.get("languages"),
-        "video_vizitka": data.get("video_vizitka"),
-        "showreel":      data.get("showreel"),
-        "portfolio":     data.get("portfolio"),
-        "projects":      data.get("projects"),
-        "phone":         data.get("phone"),
-        "instagram":     data.get("instagram"),
-        "photo1_id":     data.get("photo1_id"),
-        "photo2_id":     data.get("photo2_id"),
-        "photo3_id":     data.get("photo3_id"),
-        "photo4_id":     data.get("photo4_id"),
-        # быстрые TG-ссылки (json)
-        "photo1_tg":     json.dumps(data.get("photo1_tg")) if isinstance(data.get("photo1_tg"), dict) else data.get("photo1_tg"),
-        "photo2_tg":     json.dumps(data.get("photo2_tg")) if isinstance(data.get("photo2_tg"), dict) else data.get("photo2_tg"),
-        "photo3_tg":     json.dumps(data.get("photo3_tg")) if isinstance(data.get("photo3_tg"), dict) else data.get("photo3_tg"),
-        "photo4_tg":     json.dumps(data.get("photo4_tg")) if isinstance(data.get("photo4_tg"), dict) else data.get("photo4_tg"),
-    }
+async def get_user(user_id: int) -> Optional[Dict[str, Any]]:
+    return await users.get(user_id)
 
-    fields = ", ".join(payload.keys())
-    placeholders = ", ".join("?" for _ in payload)
-    updates = ", ".join(f"{k}=excluded.{k}" for k in payload.keys())
-
-    cur.execute(
-        f"""
-        INSERT INTO users (user_id, {fields}, created_at, updated_at)
-        VALUES (?, {placeholders}, ?, ?)
-        ON CONFLICT(user_id) DO UPDATE SET
-            {updates},
-            updated_at=excluded.updated_at
-        """,
-        [user_id, *payload.values(), now, now],
-    )
-    con.commit()
-    con.close()
-
-def get_user(user_id: int) -> Optional[Dict[str, Any]]:
-    con = sqlite3.connect(DB_PATH)
-    con.row_factory = sqlite3.Row
-    cur = con.cursor()
-    cur.execute("SELECT * FROM users WHERE user_id=?", (user_id,))
-    row = cur.fetchone()
-    con.close()
-    if not row:
-        return None
-    d = dict(row)
-    # распарсим json из photo*_tg в dict
-    for i in (1, 2, 3, 4):
-        key = f"photo{i}_tg"
-        v = d.get(key)
-        if isinstance(v, str) and v.strip():
-            try:
-                d[key] = json.loads(v)
-            except Exception:
-                pass
-    return d
+async def save_user(user_id: int, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    # запись + перечитывание за один заход в поток базы
+    return await users.save_and_get(user_id, data)
 
 # --- STATE ------------------------------------------------------------------
 
@@ -480,10 +374,9 @@ async def advance_or_finish(uid: int, chat_id: int):
 
     # 🔚 РАННИЙ ФИНИШ ДЛЯ ТОЧЕЧНОГО РЕДАКТИРОВАНИЯ
     if st.pop("finish_after_step", False):
-        old = get_user(uid) or {}
+        old = await get_user(uid) or {}
         to_save = {**old, **st.get("answers", {})}
-        upsert_user(uid, to_save)
-        u = get_user(uid)
+        u = await save_user(uid, to_save)
 
         try:
             if st.get("screen_id"):
@@ -504,10 +397,9 @@ async def advance_or_finish(uid: int, chat_id: int):
     while st["step"] < len(STEPS) and not step_in_scope(STEPS[st["step"]], scope):
         st["step"] += 1
     if st["step"] >= len(STEPS):
-        old = get_user(uid) or {}
+        old = await get_user(uid) or {}
         to_save = {**old, **st["answers"]}
-        upsert_user(uid, to_save)
-        u = get_user(uid)
+        u = await save_user(uid, to_save)
         try:
             if st.get("screen_id"):
                 await client.delete_messages(chat_id, st["screen_id"])
@@ -705,7 +597,7 @@ async def edit_profile(ev: events.CallbackQuery.Event):
         if "step" in st and "answers" in st:
             return
 
-        u = get_user(uid)
+        u = await get_user(uid)
         if not u:
             STATE[uid].update({"step": 0, "answers": {}, "scope": None})
             await render_step(uid, chat_id)
@@ -733,7 +625,7 @@ async def edit_form(ev: events.CallbackQuery.Event):
         return
     st["busy"] = True
     try:
-        u = get_user(uid)
+        u = await get_user(uid)
         if not u:
             await delete_album(chat_id, uid)
             await clear_tmp_msgs(chat_id, uid)
@@ -772,7 +664,7 @@ async def edit_photos(ev: events.CallbackQuery.Event):
         return
     st["busy"] = True
     try:
-        u = get_user(uid)
+        u = await get_user(uid)
         if not u:
             await delete_album(chat_id, uid)
             await clear_tmp_msgs(chat_id, uid)
@@ -807,7 +699,7 @@ async def start_form_or_profile(ev: events.CallbackQuery.Event):
         return
     st["busy"] = True
     try:
-        u = get_user(uid)
+        u = await get_user(uid)
         await clear_tmp_msgs(chat_id, uid)
 
         if u:
@@ -836,7 +728,7 @@ async def my_profile(ev: events.CallbackQuery.Event):
         return
     st["busy"] = True
     try:
-        u = get_user(uid)
+        u = await get_user(uid)
         await clear_tmp_msgs(chat_id, uid)
 
         if not u:
@@ -866,7 +758,7 @@ async def go_back(ev: events.CallbackQuery.Event):
     try:
         async def show_single_screen():
             await clear_tmp_msgs(chat_id, uid)
-            u = get_user(uid)
+            u = await get_user(uid)
             if not u:
                 await delete_album(chat_id, uid)
                 STATE[uid].update({"step": 0, "answers": {}, "scope": None})
@@ -891,7 +783,7 @@ async def go_back(ev: events.CallbackQuery.Event):
 
             if scope in ("form", "photos"):
                 await clear_tmp_msgs(chat_id, uid)
-                u = get_user(uid)
+                u = await get_user(uid)
                 if u:
                     await show_profile_screen(uid, chat_id, u, reposition=True, edit_mode=True, reset_album=False)
                 else:
@@ -922,7 +814,7 @@ async def go_back(ev: events.CallbackQuery.Event):
             st.pop("answers", None)
             if scope in ("form", "photos"):
                 await clear_tmp_msgs(chat_id, uid)
-                u = get_user(uid)
+                u = await get_user(uid)
                 if u:
                     await show_profile_screen(uid, chat_id, u, reposition=True, edit_mode=True, reset_album=False)
                 else:
@@ -956,7 +848,7 @@ async def edit_single_field(ev: events.CallbackQuery.Event):
         return
     st["busy"] = True
     try:
-        u = get_user(uid)
+        u = await get_user(uid)
         if not u:
             await delete_album(chat_id, uid)
             STATE[uid].update({"step": 0, "answers": {}, "scope": None})
@@ -1189,7 +1081,7 @@ async def show_profile_screen(
 # --- RUN --------------------------------------------------------------------
 
 def main():
-    init_db()
+    client.loop.run_until_complete(init_db())
     print("🤖 Бот регистрации запущен. Готов принимать анкеты...")
     client.run_until_disconnected()
 
@@ -0,0 +1,191 @@
+"""
+Хранилище анкет user_reg_bot: data/actors.db, таблица users.
+
+Одно долгоживущее соединение вместо sqlite3.connect на каждый вызов, WAL (матчер читает
+базу параллельно, не мешая записи), synchronous=NORMAL и кэш страниц в памяти.
+SQL — постоянные строки, поэтому sqlite3 готовит каждый запрос один раз и дальше берёт
+его из кэша стейтментов соединения.
+
+Вся работа с диском идёт в отдельном потоке (один поток — одно соединение, запросы по очереди),
+хендлеры Telethon только ждут результат через await и не блокируют event loop.
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+DB_PATH = Path(__file__).resolve().parents[1] / "data" / "actors.db"
+
+# Колонки анкеты в том порядке, в каком их пишет upsert (user_id и даты — отдельно)
+USER_COLUMNS = (
+    "full_name", "cities", "sex", "age_range", "look_type", "body_type", "height_cm", "weight_kg",
+    "hair", "languages", "video_vizitka", "showreel", "portfolio", "projects", "phone", "instagram",
+    "photo1_id", "photo2_id", "photo3_id", "photo4_id",
+    "photo1_tg", "photo2_tg", "photo3_tg", "photo4_tg",
+)
+PHOTO_TG_COLUMNS = ("photo1_tg", "photo2_tg", "photo3_tg", "photo4_tg")
+
+CREATE_SQL = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY,
+    full_name TEXT,
+    cities TEXT,
+    sex TEXT,
+    age_range TEXT,
+    look_type TEXT,
+    body_type TEXT,
+    height_cm INTEGER,
+    weight_kg INTEGER,
+    hair TEXT,
+    languages TEXT,
+    video_vizitka TEXT,
+    showreel TEXT,
+    portfolio TEXT,
+    projects TEXT,
+    phone TEXT,
+    instagram TEXT,
+    photo1_id TEXT,
+    photo2_id TEXT,
+    photo3_id TEXT,
+    photo4_id TEXT,
+    photo1_tg TEXT,
+    photo2_tg TEXT,
+    photo3_tg TEXT,
+    photo4_tg TEXT,
+    created_at TEXT,
+    updated_at TEXT
+)
+"""
+
+UPSERT_SQL = f"""
+INSERT INTO users (user_id, {", ".join(USER_COLUMNS)}, created_at, updated_at)
+VALUES (?, {", ".join("?" for _ in USER_COLUMNS)}, ?, ?)
+ON CONFLICT(user_id) DO UPDATE SET
+    {", ".join(f"{c}=excluded.{c}" for c in USER_COLUMNS)},
+    updated_at=excluded.updated_at
+"""
+
+SELECT_SQL = "SELECT * FROM users WHERE user_id=?"
+
+
+def _to_int(v):
+    try:
+        return int(str(v).strip())
+    except Exception:
+        return None
+
+
+def _joined(v):
+    return ", ".join(v) if isinstance(v, list) else v
+
+
+def _photo_tg(v):
+    # быстрые TG-ссылки на фото храним как json
+    return json.dumps(v) if isinstance(v, dict) else v
+
+
+def user_row(data: Dict[str, Any]) -> tuple:
+    """
+    Ответы мастера -> значения колонок USER_COLUMNS.
+    """
+    values = []
+    for col in USER_COLUMNS:
+        v = data.get(col)
+        if col in ("cities", "languages"):
+            v = _joined(v)
+        elif col in ("height_cm", "weight_kg"):
+            v = _to_int(v)
+        elif col in PHOTO_TG_COLUMNS:
+            v = _photo_tg(v)
+        values.append(v)
+    return tuple(values)
+
+
+class UserStore:
+    def __init__(self, db_path: Path = DB_PATH):
+        self.db_path = str(db_path)
+        self._lock = threading.Lock()
+        self._con: Optional[sqlite3.Connection] = None
+        # один поток: соединение используется только из него, запросы выстраиваются в очередь
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="user_store")
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._con is None:
+            con = sqlite3.connect(self.db_path, timeout=30, isolation_level=None,
+                                  check_same_thread=False, cached_statements=64)
+            con.row_factory = sqlite3.Row
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")   # в WAL fsync только на чекпоинте
+            con.execute("PRAGMA cache_size=-8000")     # ~8 МБ страниц в памяти
+            con.execute("PRAGMA temp_store=MEMORY")
+            self._con = con
+        return self._con
+
+    # --- синхронные операции (выполняются в потоке хранилища) ---------------
+
+    def init_sync(self):
+        with self._lock:
+            con = self._connect()
+            con.execute(CREATE_SQL)
+            # миграция на случай старой базы
+            for col in PHOTO_TG_COLUMNS:
+                try:
+                    con.execute(f"ALTER TABLE users ADD COLUMN {col} TEXT")
+                except sqlite3.OperationalError:
+                    pass
+
+    def upsert_sync(self, user_id: int, data: Dict[str, Any]):
+        now = datetime.utcnow().isoformat()
+        with self._lock:
+            self._connect().execute(UPSERT_SQL, (user_id, *user_row(data), now, now))
+
+    def get_sync(self, user_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connect().execute(SELECT_SQL, (user_id,)).fetchone()
+        if not row:
+            return None
+        d = dict(row)
+        # распарсим json из photo*_tg в dict
+        for key in PHOTO_TG_COLUMNS:
+            v = d.get(key)
+            if isinstance(v, str) and v.strip():
+                try:
+                    d[key] = json.loads(v)
+                except Exception:
+                    pass
+        return d
+
+    # --- async-обёртки для хендлеров ----------------------------------------
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def init(self):
+        await self._run(self.init_sync)
+
+    async def upsert(self, user_id: int, data: Dict[str, Any]):
+        await self._run(self.upsert_sync, user_id, data)
+
+    async def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        return await self._run(self.get_sync, user_id)
+
+    async def save_and_get(self, user_id: int, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Запись и перечитывание одним заходом в поток хранилища.
+        """
+        def _save_and_get():
+            self.upsert_sync(user_id, data)
+            return self.get_sync(user_id)
+        return await self._run(_save_and_get)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            if self._con is not None:
+                self._con.close()
+                self._con = None
@@ -1,8 +1,16 @@
 import os
+import sys
+import json
+import asyncio
 from openai import OpenAI
 from dotenv import load_dotenv
 from pathlib import Path
 
+# shared/ лежит в корне проекта, а бот запускается из filters/
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from shared.llm_cache import get_cache, make_key
+from shared.llm_client import chat_completion
+
 # Подгружаем ключ
 env_path = Path(__file__).resolve().parent.parent / "telegram_bot" / ".env"
 load_dotenv(dotenv_path=env_path)
@@ -10,10 +18,52 @@ openai_key = os.getenv("OPENAI_API_KEY")
 
 client = OpenAI(api_key=openai_key)
 
+MODEL = "gpt-4o-mini"
+PROMPT_VERSION = "match_profile_with_casting/1"  # менять при правке промпта — сбрасывает кэш
+BATCH_PROMPT_VERSION = "match_profiles_batch/1"
+BATCH_SIZE = int(os.getenv("MATCH_BATCH_SIZE", "30"))
+
+SYSTEM_PROMPT = "Ты профессиональный кастинг-директор."
+
+
+def profile_fields(profile):
+    """
+    Поля профиля для промпта. Понимает и ключи users.json, и колонки таблицы users из actors.db.
+    """
+    def pick(*keys):
+        for k in keys:
+            v = profile.get(k)
+            if v not in (None, ""):
+                return v
+        return "-"
+
+    return {
+        "Пол": pick("sex"),
+        "Типаж": pick("type", "look_type"),
+        "Игровой Возраст": pick("age", "age_range"),
+        "Рост": pick("height", "height_cm"),
+        "Телосложение": pick("body", "body_type"),
+        "Город": pick("location", "cities"),
+    }
+
+
+def _match_extra(casting_text, profile):
+    # normalize() в ключе стирает цифры и @контакты, а для матчинга важны возраст и рост из текста —
+    # поэтому сырой текст кастинга тоже в ключе (как в format_casting_template)
+    return json.dumps([casting_text or "", profile], ensure_ascii=False, sort_keys=True)
+
+
 def match_profile_with_casting(casting_text, profile):
     """
     Возвращает True, если кастинг подходит под профиль.
     """
+    cache_key = make_key(casting_text, PROMPT_VERSION, MODEL, extra=_match_extra(casting_text, profile))
+    cached = get_cache().get(cache_key)
+    if cached is not None:
+        print(f"🗄️ Ответ GPT из кэша: {'да' if cached else 'нет'}")
+        return cached
+
+    profile_block = "\n".join(f"{k}: {v}" for k, v in profile_fields(profile).items())
     prompt = f"""
 У тебя есть кастинг и актёрский профиль. Твоя задача — определить, подходит ли данный кастинг этому человеку.
 
@@ -25,12 +75,7 @@ def match_profile_with_casting(casting_text, profile):
 {casting_text}
 
 👤 Профиль актёра:
-Пол: {profile.get('sex', '-')}
-Типаж: {profile.get('type', '-')}
-Игровой Возраст: {profile.get('age', '-')}
-Рост: {profile.get('height', '-')}
-Телосложение: {profile.get('body', '-')}
-Город: {profile.get('location', '-')}
+{profile_block}
 
 Подходит ли данный кастинг этому человеку?
 Ответь строго: да или нет.
@@ -38,9 +83,9 @@ def match_profile_with_casting(casting_text, profile):
 
     try:
         response = client.chat.completions.create(
-            model="gpt-4o-mini",
+            model=MODEL,
             messages=[
-                {"role": "system", "content": "Ты профессиональный кастинг-директор."},
+                {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.3,
@@ -51,8 +96,10 @@ def match_profile_with_casting(casting_text, profile):
 
         # Строгая проверка
         if answer.startswith("да"):
+            get_cache().set(cache_key, True)
             return True
         elif answer.startswith("нет"):
+            get_cache().set(cache_key, False)
             return False
         else:
             print("⚠️ Нестандартный ответ от GPT, считаем как 'нет'")
@@ -60,4 +107,107 @@ def match_profile_with_casting(casting_text, profile):
 
     except Exception as e:
         print(f"❌ Ошибка при сопоставлении профиля: {e}")
-        return False
\ No newline at end of file
+        return False
+
+
+# 📐 Ответ пачкой: вердикт по каждому id
+BATCH_SCHEMA = {
+    "name": "profile_verdicts",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "verdicts": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "id": {"type": "string"},
+                        "match": {"type": "boolean"},
+                    },
+                    "required": ["id", "match"],
+                    "additionalProperties": False,
+                },
+            },
+        },
+        "required": ["verdicts"],
+        "additionalProperties": False,
+    },
+}
+
+
+def _batch_cache_key(casting_text, profile):
+    return make_key(casting_text, BATCH_PROMPT_VERSION, MODEL, extra=_match_extra(casting_text, profile))
+
+
+async def _match_chunk(casting_text, chunk):
+    """
+    Один запрос на пачку профилей. chunk: {user_id: профиль}. Возвращает {user_id: bool}.
+    """
+    lines = []
+    for user_id, profile in chunk.items():
+        fields = "; ".join(f"{k}: {v}" for k, v in profile_fields(profile).items())
+        lines.append(f"id={user_id} | {fields}")
+    profiles_block = "\n".join(lines)
+
+    prompt = f"""
+У тебя есть кастинг и список актёрских профилей. Для КАЖДОГО профиля определи, подходит ли ему данный кастинг.
+
+Будь гибким:
+- Если в кастинге отсутствуют какие-либо требования (например, типаж, рост или телосложение), это не должно мешать подбору.
+- Если параметры совпадают частично, но по сути человек мог бы подойти на роль — также считай, что подходит.
+
+📄 Кастинг:
+{casting_text}
+
+👥 Профили актёров (по одному в строке):
+{profiles_block}
+
+Верни вердикт для каждого id из списка.
+"""
+
+    response = await chat_completion(
+        model=MODEL,
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.3,
+        response_format={"type": "json_schema", "json_schema": BATCH_SCHEMA},
+    )
+    verdicts = json.loads(response.choices[0].message.content).get("verdicts", [])
+    by_id = {str(v.get("id")): bool(v.get("match")) for v in verdicts}
+    # id, которые GPT пропустил, считаем как 'нет' и не кэшируем
+    return {user_id: by_id[str(user_id)] for user_id in chunk if str(user_id) in by_id}
+
+
+async def match_profiles_batch(casting_text, profiles, chunk_size=BATCH_SIZE):
+    """
+    Матчинг кастинга сразу с многими профилями: пачки по chunk_size в одном запросе,
+    пачки идут параллельно (лимит — OPENAI_MAX_CONCURRENCY в shared.llm_client).
+    profiles: {user_id: профиль}. Возвращает список подошедших user_id.
+    """
+    cache = get_cache()
+    matched, pending = [], {}
+    for user_id, profile in profiles.items():
+        cached = cache.get(_batch_cache_key(casting_text, profile))
+        if cached is None:
+            pending[user_id] = profile
+        elif cached:
+            matched.append(user_id)
+
+    items = list(pending.items())
+    chunks = [dict(items[i:i + chunk_size]) for i in range(0, len(items), chunk_size)]
+    print(f"🤖 Пакетный матчинг: {len(profiles)} профилей, из кэша {len(profiles) - len(pending)}, "
+          f"запросов в GPT: {len(chunks)}")
+
+    results = await asyncio.gather(*(_match_chunk(casting_text, c) for c in chunks), return_exceptions=True)
+    for chunk, result in zip(chunks, results):
+        if isinstance(result, Exception):
+            print(f"❌ Ошибка пакетного сопоставления ({len(chunk)} профилей): {result}")
+            continue
+        for user_id, is_match in result.items():
+            cache.set(_batch_cache_key(casting_text, chunk[user_id]), is_match)
+            if is_match:
+                matched.append(user_id)
+    return matched
@@ -0,0 +1,290 @@
+import hashlib
+import os
+import sqlite3
+import struct
+import threading
+import time
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from shared.image_hash import BKTree
+from shared.normalize import date_tokens, word_shingles
+
+# 📦 Персистентный индекс дублей: точный хэш + MinHash-LSH для поиска кандидатов.
+# Вместо окна из 20 записей храним всё за RETENTION_DAYS дней. Старое окно (seen_castings_texts.json)
+# не импортируем: там тексты с цифрами, заменёнными на #, а ключ теперь хранит даты и числа.
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(__file__), 'seen_castings.db')
+
+RETENTION_DAYS = float(os.getenv('DEDUP_RETENTION_DAYS', '14'))
+SIMILARITY_THRESHOLD = 0.90
+# dHash: до скольких отличающихся бит из 64 картинки считаем одной афишей
+IMAGE_MAX_DISTANCE = int(os.getenv('DEDUP_IMAGE_MAX_DISTANCE', '6'))
+
+# 64 корзины = 16 полос по 4 строки: при Жаккаре ~0.7 кандидат находится с вероятностью ~99%
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+# Кандидат должен совпасть хотя бы в MIN_BANDS полосах (оценка Жаккара ≳ 0.65): по одной-двум полосам
+# сходятся посты с общими шаблонными фразами, а SequenceMatcher на каждом из них — основная цена поиска.
+# На синтетике у настоящих репостов 3–16 общих полос, у чужих постов — почти всегда 1–2.
+MIN_BANDS = int(os.getenv('DEDUP_MIN_BANDS', '3'))
+MAX_CANDIDATES = 10
+
+_EMPTY = -1
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def shingles(text: str, k: int = SHINGLE_SIZE) -> frozenset:
+    return word_shingles(text.split(), k)
+
+
+def dates_compatible(a: str, b: str) -> bool:
+    """
+    Тот же шаблон с другими датами съёмки — новый набор, а не репост.
+    Если даты есть только в одном тексте или хотя бы одна общая — не мешаем fuzzy.
+    """
+    da, db = date_tokens(a), date_tokens(b)
+    return not (da and db and da.isdisjoint(db))
+
+
+def minhash(shingle_set: Iterable[str]) -> List[int]:
+    """
+    One-permutation MinHash: каждый шингл хэшируем один раз и раскладываем по NUM_PERM корзинам,
+    пустые корзины заполняем соседними (densification). Это O(шинглов) вместо O(шинглов * NUM_PERM).
+    """
+    signature = [_EMPTY] * NUM_PERM
+    for s in shingle_set:
+        h = int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest(), 'little')
+        slot, value = h % NUM_PERM, h >> 32
+        if signature[slot] == _EMPTY or value < signature[slot]:
+            signature[slot] = value
+
+    if all(v == _EMPTY for v in signature):
+        return [0] * NUM_PERM
+    # Пустую корзину заполняем значением ближайшей непустой справа (по кругу) + номер шага
+    dense = list(signature)
+    for i in range(NUM_PERM):
+        if signature[i] != _EMPTY:
+            continue
+        step = 1
+        while signature[(i + step) % NUM_PERM] == _EMPTY:
+            step += 1
+        dense[i] = (signature[(i + step) % NUM_PERM] + step * 0x9E3779B1) & 0xFFFFFFFF
+    return dense
+
+
+def lsh_buckets(signature: List[int]) -> List[int]:
+    buckets = []
+    for band in range(BANDS):
+        chunk = struct.pack(f'<{ROWS}I', *signature[band * ROWS:(band + 1) * ROWS])
+        digest = hashlib.blake2b(chunk, digest_size=8).digest()
+        buckets.append(int.from_bytes(digest, 'little', signed=True))
+    return buckets
+
+
+class DedupIndex:
+    """
+    Индекс уже виденных кастингов в SQLite.
+    check_and_add атомарно проверяет текст и, если дубля нет, запоминает его.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, retention_days: float = RETENTION_DAYS,
+                 threshold: float = SIMILARITY_THRESHOLD):
+        self.db_path = db_path
+        self.retention_seconds = retention_days * 86400
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+        self._image_tree: Optional[BKTree] = None
+        self._image_origins: Dict[int, str] = {}
+        self.con = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.con.execute("PRAGMA journal_mode=WAL")
+        self.con.execute("PRAGMA synchronous=NORMAL")
+        self._init_schema()
+
+    def _init_schema(self):
+        self.con.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS castings (
+                id INTEGER PRIMARY KEY,
+                text_hash TEXT NOT NULL UNIQUE,
+                text TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS castings_created_at ON castings(created_at);
+            CREATE TABLE IF NOT EXISTS lsh (
+                band INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                casting_id INTEGER NOT NULL,
+                PRIMARY KEY (band, bucket, casting_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS lsh_casting ON lsh(casting_id);
+            CREATE TABLE IF NOT EXISTS images (
+                id INTEGER PRIMARY KEY,
+                phash INTEGER NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS images_created_at ON images(created_at);
+            """
+        )
+        # миграция: origin = "chat_id:message_id" — чья это запись (повтор задачи не дубль сам себе)
+        for table in ("castings", "images"):
+            try:
+                self.con.execute(f"ALTER TABLE {table} ADD COLUMN origin TEXT")
+            except sqlite3.OperationalError:
+                pass
+
+    def _candidates(self, buckets: List[int], cutoff: float) -> List[Tuple[int, str, Optional[str]]]:
+        where = " OR ".join("(l.band=? AND l.bucket=?)" for _ in buckets)
+        params = [v for band, bucket in enumerate(buckets) for v in (band, bucket)]
+        return self.con.execute(
+            f"""
+            SELECT c.id, c.text, c.origin FROM lsh l JOIN castings c ON c.id = l.casting_id
+            WHERE ({where}) AND c.created_at >= ?
+            GROUP BY c.id HAVING COUNT(*) >= ? ORDER BY COUNT(*) DESC LIMIT {MAX_CANDIDATES}
+            """,
+            [*params, cutoff, MIN_BANDS],
+        ).fetchall()
+
+    def check_and_add(self, text: str, shingle_set: Optional[Iterable[str]] = None,
+                      origin: Optional[str] = None) -> Tuple[bool, Optional[str], float]:
+        """
+        Возвращает (дубль?, причина 'exact'/'fuzzy'/None, степень совпадения).
+        shingle_set — готовые шинглы из fingerprint(), чтобы не резать текст второй раз.
+        origin — "chat_id:message_id": запись того же сообщения (задачу взяли повторно
+        после падения) дублем не считается.
+        """
+        now = time.time()
+        cutoff = now - self.retention_seconds
+        h = text_hash(text)
+        buckets = lsh_buckets(minhash(shingle_set if shingle_set is not None else shingles(text)))
+
+        with self._lock:
+            self.con.execute("BEGIN IMMEDIATE")
+            try:
+                # 1️⃣ Точное совпадение по хэшу
+                row = self.con.execute(
+                    "SELECT created_at, origin FROM castings WHERE text_hash=?", (h,)
+                ).fetchone()
+                if row and row[0] >= cutoff:
+                    self.con.execute("COMMIT")
+                    if origin is not None and row[1] == origin:
+                        return False, None, 0.0
+                    return True, 'exact', 1.0
+
+                # 2️⃣ Fuzzy только по кандидатам из LSH
+                # индекс символов нового текста (seq2) строится один раз на все кандидаты
+                sm = SequenceMatcher(None)
+                sm.set_seq2(text)
+                for _, entry, entry_origin in self._candidates(buckets, cutoff):
+                    if origin is not None and entry_origin == origin:
+                        continue
+                    sm.set_seq1(entry)
+                    if sm.real_quick_ratio() < self.threshold or sm.quick_ratio() < self.threshold:
+                        continue
+                    ratio = sm.ratio()
+                    if ratio >= self.threshold and dates_compatible(entry, text):
+                        self.con.execute("COMMIT")
+                        return True, 'fuzzy', ratio
+
+                # 💾 Добавление (просроченную запись с тем же хэшем заменяем)
+                if row:
+                    self._delete_where("text_hash=?", (h,))
+                cur = self.con.execute(
+                    "INSERT INTO castings (text_hash, text, created_at, origin) VALUES (?, ?, ?, ?)",
+                    (h, text, now, origin),
+                )
+                self.con.executemany(
+                    "INSERT OR IGNORE INTO lsh (band, bucket, casting_id) VALUES (?, ?, ?)",
+                    [(band, bucket, cur.lastrowid) for band, bucket in enumerate(buckets)],
+                )
+                self.con.execute("COMMIT")
+            except Exception:
+                self.con.execute("ROLLBACK")
+                raise
+
+            if now - self._last_purge > 3600:
+                self.purge(now)
+        return False, None, 0.0
+
+    def _load_image_tree(self, cutoff: float) -> BKTree:
+        tree = BKTree()
+        self._image_origins = {}
+        for image_id, phash, origin in self.con.execute(
+            "SELECT id, phash, origin FROM images WHERE created_at >= ?", (cutoff,)
+        ):
+            tree.add(phash & 0xFFFFFFFFFFFFFFFF, image_id)
+            if origin is not None:
+                self._image_origins[image_id] = origin
+        return tree
+
+    def check_and_add_image(self, phash: int, max_distance: int = IMAGE_MAX_DISTANCE,
+                            origin: Optional[str] = None) -> Tuple[bool, int]:
+        """
+        Перцептивный хэш картинки: (дубль?, расстояние Хэмминга до ближайшей).
+        Поиск — по BK-дереву в памяти, сами хэши живут в той же базе с тем же сроком хранения.
+        origin — как в check_and_add: своя же картинка при повторе задачи не дубль.
+        """
+        now = time.time()
+        with self._lock:
+            if self._image_tree is None:
+                self._image_tree = self._load_image_tree(now - self.retention_seconds)
+
+            matches = self._image_tree.search(phash, max_distance)
+            found = [(d, image_id) for d, image_id in matches
+                     if origin is None or self._image_origins.get(image_id) != origin]
+            if found:
+                return True, found[0][0]
+            if matches:
+                # совпала только своя же запись — уже сохранена
+                return False, -1
+
+            # SQLite INTEGER знаковый — храним 64 бита как signed
+            signed = phash - (1 << 64) if phash >= (1 << 63) else phash
+            cur = self.con.execute(
+                "INSERT INTO images (phash, created_at, origin) VALUES (?, ?, ?)", (signed, now, origin)
+            )
+            self._image_tree.add(phash, cur.lastrowid)
+            if origin is not None:
+                self._image_origins[cur.lastrowid] = origin
+        return False, -1
+
+    def _delete_where(self, condition: str, params: tuple):
+        self.con.execute(
+            f"DELETE FROM lsh WHERE casting_id IN (SELECT id FROM castings WHERE {condition})", params
+        )
+        self.con.execute(f"DELETE FROM castings WHERE {condition}", params)
+
+    def purge(self, now: Optional[float] = None):
+        # 🧹 Удаляем всё старше срока хранения
+        now = now or time.time()
+        self._last_purge = now
+        cutoff = now - self.retention_seconds
+        self.con.execute("BEGIN IMMEDIATE")
+        try:
+            self._delete_where("created_at < ?", (cutoff,))
+            self.con.execute("DELETE FROM images WHERE created_at < ?", (cutoff,))
+            self.con.execute("COMMIT")
+        except Exception:
+            self.con.execute("ROLLBACK")
+            raise
+        # из BK-дерева не удалить — пересоберём при следующем обращении
+        self._image_tree = None
+
+    def __len__(self):
+        return self.con.execute("SELECT COUNT(*) FROM castings").fetchone()[0]
+
+
+_default_index: Optional[DedupIndex] = None
+
+
+def get_index() -> DedupIndex:
+    global _default_index
+    if _default_index is None:
+        _default_index = DedupIndex(os.getenv('DEDUP_DB_PATH', DEFAULT_DB_PATH))
+    return _default_index
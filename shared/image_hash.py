@@ -0,0 +1,77 @@
+from typing import Dict, List, Optional, Tuple, Union
+
+from PIL import Image
+
+# 🖼️ Перцептивный хэш (dHash) для поиска перезаливов одной и той же афиши
+# и BK-дерево для поиска по расстоянию Хэмминга.
+
+HASH_SIZE = 8  # 8x8 = 64 бита
+
+
+def dhash(image: Union[str, Image.Image], hash_size: int = HASH_SIZE) -> int:
+    """
+    64-битный dHash: уменьшаем до (hash_size+1) x hash_size в оттенках серого
+    и кодируем, светлее ли пиксель соседа справа. Пережатие, ресайз и мелкие правки хэш почти не меняют.
+    image — путь к файлу или уже декодированная картинка (MediaBlob.image()).
+    """
+    if isinstance(image, Image.Image):
+        small = image.convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS)
+    else:
+        with Image.open(image) as img:
+            # JPEG декодируем сразу в уменьшенном виде — это в разы быстрее полного декода
+            img.draft('L', (hash_size * 8, hash_size * 8))
+            small = img.convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            value = (value << 1) | (1 if left > right else 0)
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+class BKTree:
+    """
+    BK-дерево по метрике Хэмминга: поиск всех хэшей на расстоянии <= d без полного перебора.
+    """
+
+    def __init__(self):
+        self.root: Optional[Tuple[int, int, Dict[int, tuple]]] = None  # (хэш, id, дети по расстоянию)
+        self.size = 0
+
+    def add(self, value: int, item_id: int):
+        self.size += 1
+        node = (value, item_id, {})
+        if self.root is None:
+            self.root = node
+            return
+        current = self.root
+        while True:
+            d = hamming(value, current[0])
+            child = current[2].get(d)
+            if child is None:
+                current[2][d] = node
+                return
+            current = child
+
+    def search(self, value: int, max_distance: int) -> List[Tuple[int, int]]:
+        """
+        [(расстояние, id), ...] по возрастанию расстояния.
+        """
+        if self.root is None:
+            return []
+        found, stack = [], [self.root]
+        while stack:
+            node_value, item_id, children = stack.pop()
+            d = hamming(value, node_value)
+            if d <= max_distance:
+                found.append((d, item_id))
+            for child_d, child in children.items():
+                if d - max_distance <= child_d <= d + max_distance:
+                    stack.append(child)
+        return sorted(found)
@@ -1,51 +1,26 @@
-import json
-import os
-import fcntl
-from difflib import SequenceMatcher
-from shared.normalize import normalize
-
-DB_PATH = os.path.join(os.path.dirname(__file__), '..', 'shared', 'seen_castings_texts.json')
-SIMILARITY_THRESHOLD = 0.90
-
-def is_duplicate_casting(text='', ocr_text=''):
-    normalized_text = normalize(text or '')
-    normalized_ocr = normalize(ocr_text or '')
-    combined_normalized = normalized_text + ' | ' + normalized_ocr
-
-    # Убедимся, что файл существует
-    if not os.path.exists(DB_PATH):
-        with open(DB_PATH, 'w', encoding='utf-8') as f:
-            json.dump([], f)
-
-    with open(DB_PATH, 'r+', encoding='utf-8') as db_file:
-        try:
-            fcntl.flock(db_file, fcntl.LOCK_EX)
-
-            try:
-                seen = json.load(db_file)
-            except json.JSONDecodeError:
-                print("⚠️ Повреждён JSON. Начинаем с пустого списка.")
-                seen = []
-
-            # 1️⃣ Прямая проверка
-            if combined_normalized in seen:
-                print("🔁 Найден дубликат (точное совпадение)")
-                return True
-
-            # 2️⃣ Fuzzy проверка
-            for entry in seen:
-                ratio = SequenceMatcher(None, entry, combined_normalized).ratio()
-                if ratio >= SIMILARITY_THRESHOLD:
-                    print(f"⚠️ Fuzzy дубликат найден: совпадение {round(ratio * 100)}%")
-                    return True
-
-            # 💾 Добавление
-            seen.append(combined_normalized)
-            db_file.seek(0)
-            db_file.truncate()
-            json.dump(seen[-20:], db_file, ensure_ascii=False, indent=2)
-
-        finally:
-            fcntl.flock(db_file, fcntl.LOCK_UN)
-
-    return False
\ No newline at end of file
+from shared.dedup_index import get_index
+from shared.metrics import counter
+from shared.normalize import fingerprint
+
+DEDUP_RESULTS = counter('dedup_checks_total', 'Проверки текстового дедупа: exact, fuzzy или new', ['result'])
+
+
+def dedup_key(text='', ocr_text=''):
+    # Ключ — с числами и датами (dedup_text), шинглы для LSH — по токенам с # из fingerprint:
+    # кандидаты находятся и при другой дате, а разные даты отсекает уже DedupIndex.
+    # fingerprint кэшируется: эвристика и ключ кэша GPT потом возьмут тот же результат
+    fp_text = fingerprint(text or '')
+    fp_ocr = fingerprint(ocr_text or '')
+    combined = fp_text.dedup_normalized + ' | ' + fp_ocr.dedup_normalized
+    return combined, fp_text.shingles | fp_ocr.shingles
+
+
+def is_duplicate_casting(text='', ocr_text='', origin=None):
+    # origin — "chat_id:message_id": при повторной обработке того же сообщения дубля нет
+    is_dup, reason, ratio = get_index().check_and_add(*dedup_key(text, ocr_text), origin=origin)
+    DEDUP_RESULTS.inc(result=reason or 'new')
+    if reason == 'exact':
+        print("🔁 Найден дубликат (точное совпадение)")
+    elif reason == 'fuzzy':
+        print(f"⚠️ Fuzzy дубликат найден: совпадение {round(ratio * 100)}%")
+    return is_dup
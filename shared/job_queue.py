@@ -0,0 +1,187 @@
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+# 📥 Очередь задач в SQLite между приёмом сообщений и их обработкой.
+# Переживает рестарт: всё, что не подтверждено ack(), будет выдано снова (at-least-once).
+# Ключ — (chat_id, message_id): одно сообщение попадает в очередь один раз.
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(__file__), 'mirror_jobs.db')
+LEASE_SECONDS = float(os.getenv('JOB_LEASE_SECONDS', '600'))
+MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+RETRY_DELAY = float(os.getenv('JOB_RETRY_DELAY', '30'))
+DONE_RETENTION_DAYS = float(os.getenv('JOB_DONE_RETENTION_DAYS', '3'))
+
+PENDING, LEASED, DONE, FAILED = 'pending', 'leased', 'done', 'failed'
+
+
+@dataclass
+class Job:
+    chat_id: int
+    message_id: int
+    attempts: int
+    enqueued_at: float
+
+
+class JobQueue:
+    """
+    enqueue → lease → ack/nack. Задача, взятая воркером, «арендована» на lease_seconds:
+    если процесс упал и ack не пришёл, после истечения аренды её возьмёт другой воркер.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, lease_seconds: float = LEASE_SECONDS,
+                 max_attempts: int = MAX_ATTEMPTS, retry_delay: float = RETRY_DELAY):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+        self.con = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.con.execute("PRAGMA journal_mode=WAL")
+        self.con.execute("PRAGMA synchronous=NORMAL")
+        self.con.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                chat_id INTEGER NOT NULL,
+                message_id INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                available_at REAL NOT NULL,
+                enqueued_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                last_error TEXT,
+                PRIMARY KEY (chat_id, message_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS jobs_ready ON jobs(status, available_at);
+            """
+        )
+
+    def enqueue(self, chat_id: int, message_id: int) -> bool:
+        """
+        False — это сообщение уже было в очереди (повторная доставка апдейта от Telegram).
+        """
+        now = time.time()
+        with self._lock:
+            cur = self.con.execute(
+                "INSERT OR IGNORE INTO jobs (chat_id, message_id, status, available_at, enqueued_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (chat_id, message_id, PENDING, now, now, now),
+            )
+        return cur.rowcount == 1
+
+    def lease(self, chat_id: Optional[int] = None) -> Optional[Job]:
+        """
+        Самая старая готовая задача: новая или с истёкшей арендой (воркер упал).
+        chat_id — только из этого источника (так выбирает планировщик по источникам).
+        """
+        now = time.time()
+        source_filter = "" if chat_id is None else " AND chat_id = ?"
+        params = (PENDING, LEASED, now) if chat_id is None else (PENDING, LEASED, now, chat_id)
+        with self._lock:
+            self.con.execute("BEGIN IMMEDIATE")
+            try:
+                while True:
+                    row = self.con.execute(
+                        "SELECT chat_id, message_id, attempts, enqueued_at FROM jobs "
+                        f"WHERE status IN (?, ?) AND available_at <= ?{source_filter} ORDER BY available_at LIMIT 1",
+                        params,
+                    ).fetchone()
+                    if row is None:
+                        self.con.execute("COMMIT")
+                        return None
+                    chat_id, message_id, attempts, enqueued_at = row
+                    if attempts < self.max_attempts:
+                        break
+                    # аренда истекала max_attempts раз — сообщение роняет воркер, больше не берём
+                    self.con.execute(
+                        "UPDATE jobs SET status=?, updated_at=?, last_error=COALESCE(last_error, 'lease expired') "
+                        "WHERE chat_id=? AND message_id=?",
+                        (FAILED, now, chat_id, message_id),
+                    )
+                    print(f"☠️ Задача {chat_id}/{message_id} сброшена после {attempts} попыток")
+
+                self.con.execute(
+                    "UPDATE jobs SET status=?, attempts=attempts+1, available_at=?, updated_at=? "
+                    "WHERE chat_id=? AND message_id=?",
+                    (LEASED, now + self.lease_seconds, now, chat_id, message_id),
+                )
+                self.con.execute("COMMIT")
+            except Exception:
+                self.con.execute("ROLLBACK")
+                raise
+        return Job(chat_id, message_id, attempts + 1, enqueued_at)
+
+    def ack(self, job: Job):
+        now = time.time()
+        with self._lock:
+            self.con.execute(
+                "UPDATE jobs SET status=?, updated_at=? WHERE chat_id=? AND message_id=?",
+                (DONE, now, job.chat_id, job.message_id),
+            )
+        if now - self._last_purge > 3600:
+            self.purge(now)
+
+    def nack(self, job: Job, error: str = ''):
+        # Ошибка обработки: повторим через retry_delay, пока не кончатся попытки
+        now = time.time()
+        final = job.attempts >= self.max_attempts
+        with self._lock:
+            self.con.execute(
+                "UPDATE jobs SET status=?, available_at=?, updated_at=?, last_error=? "
+                "WHERE chat_id=? AND message_id=?",
+                (FAILED if final else PENDING, now + self.retry_delay * job.attempts, now, error[:500],
+                 job.chat_id, job.message_id),
+            )
+        if final:
+            print(f"☠️ Задача {job.chat_id}/{job.message_id} не обработана за {job.attempts} попыток: {error}")
+
+    def ready_by_source(self) -> Dict[int, Tuple[int, float]]:
+        # {chat_id: (сколько готово к выдаче, когда поставлена самая старая)}
+        with self._lock:
+            rows = self.con.execute(
+                "SELECT chat_id, COUNT(*), MIN(enqueued_at) FROM jobs "
+                "WHERE status IN (?, ?) AND available_at <= ? GROUP BY chat_id",
+                (PENDING, LEASED, time.time()),
+            ).fetchall()
+        return {chat_id: (count, oldest) for chat_id, count, oldest in rows}
+
+    def shed(self, chat_id: int, older_than: float) -> int:
+        # Сбросить ждущие задачи источника, поставленные раньше older_than (перегрузка)
+        with self._lock:
+            cur = self.con.execute(
+                "UPDATE jobs SET status=?, updated_at=?, last_error='shed' "
+                "WHERE chat_id=? AND status=? AND enqueued_at < ?",
+                (FAILED, time.time(), chat_id, PENDING, older_than),
+            )
+        return cur.rowcount
+
+    def depth(self) -> int:
+        # Сколько ждёт или в работе. Под блокировкой: метрики читают из своего потока,
+        # а соединение одно — без неё запрос вклинится в транзакцию lease()
+        with self._lock:
+            return self.con.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (PENDING, LEASED)
+            ).fetchone()[0]
+
+    def purge(self, now: Optional[float] = None):
+        # 🧹 Готовые задачи держим DONE_RETENTION_DAYS — этого хватает, чтобы отсечь повторные апдейты
+        now = now or time.time()
+        self._last_purge = now
+        with self._lock:
+            self.con.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (DONE, FAILED, now - DONE_RETENTION_DAYS * 86400),
+            )
+
+
+_default_queue: Optional[JobQueue] = None
+
+
+def get_queue() -> JobQueue:
+    global _default_queue
+    if _default_queue is None:
+        _default_queue = JobQueue(os.getenv('JOB_QUEUE_PATH', DEFAULT_DB_PATH))
+    return _default_queue
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional, Union
+
+from shared.media import MediaBlob
+from shared.metrics import counter
+from shared.normalize import fingerprint
+
+# 🗄️ Кэш ответов GPT на диске: ключ = хэш(нормализованный текст, дайджест картинки, версия промпта, модель).
+# Репосты и повторные матчинги отвечаются локально, без запроса в OpenAI.
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(__file__), 'llm_cache.db')
+TTL_DAYS = float(os.getenv('LLM_CACHE_TTL_DAYS', '30'))
+MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '50000'))
+
+CACHE_LOOKUPS = counter('llm_cache_lookups_total', 'Обращения к кэшу ответов GPT', ['result'])
+
+
+def image_digest(image_path: Union[str, MediaBlob, None]) -> str:
+    if not image_path:
+        return ''
+    try:
+        if isinstance(image_path, MediaBlob):
+            return image_path.digest()
+        with open(image_path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except Exception as e:
+        print(f"⚠️ Не удалось посчитать дайджест фото для кэша: {e}")
+        return ''
+
+
+def make_key(text: str, prompt_version: str, model: str, image_path: Union[str, MediaBlob, None] = None, extra: str = '') -> str:
+    """
+    extra — всё, что ещё влияет на ответ (например, профиль актёра при матчинге).
+    """
+    payload = json.dumps(
+        [fingerprint(text or '').normalized, image_digest(image_path), prompt_version, model, extra],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """
+    SQLite-кэш с TTL и LRU-вытеснением сверх max_entries. Хранит JSON-значения.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, ttl_days: float = TTL_DAYS, max_entries: int = MAX_ENTRIES):
+        self.ttl_seconds = ttl_days * 86400
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self.con = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.con.execute("PRAGMA journal_mode=WAL")
+        self.con.execute("PRAGMA synchronous=NORMAL")
+        self.con.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS llm_cache_last_used ON llm_cache(last_used);
+            """
+        )
+
+    def get(self, key: str, default: Any = None) -> Any:
+        now = time.time()
+        with self._lock:
+            row = self.con.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key=?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                self.misses += 1
+                CACHE_LOOKUPS.inc(result='miss')
+                return default
+            self.con.execute("UPDATE llm_cache SET last_used=? WHERE key=?", (now, key))
+            self.hits += 1
+            CACHE_LOOKUPS.inc(result='hit')
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any):
+        now = time.time()
+        with self._lock:
+            self.con.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now, now),
+            )
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._evict(now)
+
+    def _evict(self, now: float):
+        # 🧹 Сначала просроченные, потом самые давно не использованные сверх лимита
+        self.con.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+        self.con.execute(
+            """
+            DELETE FROM llm_cache WHERE key IN (
+                SELECT key FROM llm_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_entries,),
+        )
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "entries": self.con.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0],
+        }
+
+
+_default_cache: Optional[LLMCache] = None
+
+
+def get_cache() -> LLMCache:
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = LLMCache(os.getenv('LLM_CACHE_PATH', DEFAULT_DB_PATH))
+    return _default_cache
+
@@ -0,0 +1,85 @@
+import asyncio
+import os
+import time
+from typing import Optional
+
+import httpx
+from openai import AsyncOpenAI
+from shared.metrics import counter, histogram
+
+# 🔌 Общий асинхронный клиент OpenAI: один пул HTTP-соединений на процесс,
+# ограничение на число одновременных запросов и дедлайн на каждый вызов.
+
+DEFAULT_MODEL = "gpt-4o-mini"
+MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "4"))
+DEFAULT_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "30"))
+MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+
+LLM_SECONDS = histogram('llm_request_seconds', 'Запрос в OpenAI (с ожиданием слота)', ['model'])
+LLM_REQUESTS = counter('llm_requests_total', 'Запросы в OpenAI по исходу', ['model', 'outcome'])
+LLM_TOKENS = counter('llm_tokens_total', 'Токены OpenAI', ['model', 'kind'])
+LLM_RETRIES = counter('llm_retries_total', 'Повторы запросов к GPT на нашей стороне', ['caller'])
+
+_client: Optional[AsyncOpenAI] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def get_client() -> AsyncOpenAI:
+    # Создаём лениво: ключ читается после load_dotenv() в вызывающем модуле
+    global _client
+    if _client is None:
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=MAX_CONCURRENCY * 2,
+                max_keepalive_connections=MAX_CONCURRENCY,
+            ),
+            timeout=httpx.Timeout(DEFAULT_TIMEOUT, connect=10.0),
+        )
+        _client = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            http_client=http_client,
+            max_retries=MAX_RETRIES,
+        )
+    return _client
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+    return _semaphore
+
+
+async def chat_completion(messages, model: str = DEFAULT_MODEL, timeout: Optional[float] = None, **kwargs):
+    """
+    Один запрос chat.completions. Ждёт свободный слот (OPENAI_MAX_CONCURRENCY),
+    а сам вызов обрывается через timeout секунд (по умолчанию OPENAI_TIMEOUT) — asyncio.TimeoutError.
+    """
+    started = time.perf_counter()
+    outcome = 'error'
+    try:
+        async with _get_semaphore():
+            response = await asyncio.wait_for(
+                get_client().chat.completions.create(model=model, messages=messages, **kwargs),
+                timeout=timeout or DEFAULT_TIMEOUT,
+            )
+        outcome = 'ok'
+    except asyncio.TimeoutError:
+        outcome = 'timeout'
+        raise
+    finally:
+        LLM_SECONDS.observe(time.perf_counter() - started, model=model)
+        LLM_REQUESTS.inc(model=model, outcome=outcome)
+
+    usage = getattr(response, 'usage', None)
+    if usage is not None:
+        LLM_TOKENS.inc(usage.prompt_tokens or 0, model=model, kind='prompt')
+        LLM_TOKENS.inc(usage.completion_tokens or 0, model=model, kind='completion')
+    return response
+
+
+async def aclose():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
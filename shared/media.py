@@ -0,0 +1,159 @@
+import base64
+import hashlib
+import io
+import os
+from typing import Dict, Optional, Tuple, Union
+
+from PIL import Image
+
+# 🧠 Фото сообщения в памяти: скачиваем один раз, декодируем один раз, base64 считаем один раз.
+# На диск пишем только если файл больше MEDIA_SPILL_BYTES.
+
+MEDIA_SPILL_BYTES = int(os.getenv('MEDIA_SPILL_BYTES', str(20 * 1024 * 1024)))
+
+# 📐 Картинки для GPT: OpenAI всё равно уменьшает их до размера detail-режима,
+# поэтому шлём ровно этот размер, а не полный JPEG.
+# low — вписать в 512x512; high — вписать в 2048x2048, затем короткая сторона 768.
+LLM_IMAGE_DETAIL = os.getenv('LLM_IMAGE_DETAIL', 'low')
+LLM_IMAGE_QUALITY = int(os.getenv('LLM_IMAGE_QUALITY', '85'))  # ниже 80 мелкий текст на афишах мылится
+LOW_DETAIL_SIDE = 512
+HIGH_DETAIL_MAX_SIDE = 2048
+HIGH_DETAIL_SHORT_SIDE = 768
+
+
+def llm_image_size(width: int, height: int, detail: str = LLM_IMAGE_DETAIL) -> Tuple[int, int]:
+    """
+    Размер, до которого OpenAI сам уменьшит картинку в этом detail-режиме (увеличивать не будем).
+    """
+    if detail == 'low':
+        scale = min(1.0, LOW_DETAIL_SIDE / max(width, height))
+    else:
+        scale = min(1.0, HIGH_DETAIL_MAX_SIDE / max(width, height))
+        scale *= min(1.0, HIGH_DETAIL_SHORT_SIDE / (min(width, height) * scale))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+class MediaBlob:
+    """
+    Байты (или путь к файлу, если он слишком большой для памяти) + ленивые производные:
+    декодированная картинка, sha256 и base64. Стадии берут их отсюда, а не перечитывают файл.
+    """
+
+    def __init__(self, data: Optional[bytes] = None, path: Optional[str] = None, spilled: bool = False):
+        self.data = data
+        self.path = path
+        self.spilled = spilled  # файл наш — удаляем его в close()
+        self._image: Optional[Image.Image] = None
+        self._digest: Optional[str] = None
+        self._base64: Optional[str] = None
+        self._llm_payloads: Dict[Tuple[str, int], str] = {}
+
+    @classmethod
+    async def download(cls, message, spill_bytes: int = MEDIA_SPILL_BYTES) -> Optional["MediaBlob"]:
+        expected = getattr(getattr(message, 'file', None), 'size', None) or 0
+        if expected > spill_bytes:
+            path = await message.download_media()
+            print(f"💽 Фото {expected} bytes — больше лимита, сохранено на диск: {path}")
+            return cls(path=path, spilled=True) if path else None
+        data = await message.download_media(file=bytes)
+        return cls(data=data) if data else None
+
+    @property
+    def size(self) -> int:
+        if self.data is not None:
+            return len(self.data)
+        return os.path.getsize(self.path)
+
+    @property
+    def source(self) -> Union[bytes, str]:
+        # то, что можно передать в другой процесс (OCR-пул): байты или путь
+        return self.data if self.data is not None else self.path
+
+    def read(self) -> bytes:
+        if self.data is not None:
+            return self.data
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def image(self) -> Image.Image:
+        """
+        Декодированная картинка, общая для всех стадий — менять её на месте нельзя, только копии.
+        """
+        if self._image is None:
+            img = Image.open(io.BytesIO(self.data) if self.data is not None else self.path)
+            img.load()
+            self._image = img
+        return self._image
+
+    def digest(self) -> str:
+        if self._digest is None:
+            self._digest = hashlib.sha256(self.read()).hexdigest()
+        return self._digest
+
+    def base64(self) -> str:
+        if self._base64 is None:
+            self._base64 = base64.b64encode(self.read()).decode('utf-8')
+        return self._base64
+
+    def llm_base64(self, detail: str = LLM_IMAGE_DETAIL, quality: int = LLM_IMAGE_QUALITY) -> str:
+        """
+        base64 JPEG под detail-режим GPT. Считается один раз на сообщение —
+        is_casting_ai, format_casting_template и analyze_casting получают одну и ту же строку.
+        """
+        key = (detail, quality)
+        if key not in self._llm_payloads:
+            self._llm_payloads[key] = self._encode_for_llm(detail, quality)
+        return self._llm_payloads[key]
+
+    def _encode_for_llm(self, detail: str, quality: int) -> str:
+        try:
+            img = self.image()
+            size = llm_image_size(*img.size, detail=detail)
+            # общая картинка не трогается: resize/convert возвращают копию
+            small = img.convert('RGB') if img.mode != 'RGB' else img
+            if size != img.size:
+                small = small.resize(size, Image.LANCZOS)
+            buf = io.BytesIO()
+            small.save(buf, format='JPEG', quality=quality, optimize=True)
+            encoded = buf.getvalue()
+        except Exception as e:
+            print(f"⚠️ Не удалось уменьшить фото для GPT, шлём оригинал: {e}")
+            return self.base64()
+        if len(encoded) >= self.size:
+            # маленький исходник уже легче — пережатие только испортит качество
+            return self.base64()
+        return base64.b64encode(encoded).decode('utf-8')
+
+    def close(self):
+        if self._image is not None:
+            self._image.close()
+            self._image = None
+        if self.spilled and self.path:
+            try:
+                os.remove(self.path)
+            except Exception as e:
+                print(f"⚠️ Не удалось удалить временное фото: {e}")
+        self.data = None
+        self.path = None
+        self._base64 = None
+        self._llm_payloads.clear()
+
+
+def as_media(image: Union[str, MediaBlob, None]) -> Optional[MediaBlob]:
+    # Старые вызовы передают путь к файлу — заворачиваем его, файл при этом не наш и не удаляется
+    if image is None or isinstance(image, MediaBlob):
+        return image
+    return MediaBlob(path=image)
+
+
+def image_content(image: Union[str, MediaBlob], detail: str = LLM_IMAGE_DETAIL) -> dict:
+    """
+    Кусок content для chat.completions с картинкой, уменьшенной под detail.
+    """
+    return {
+        "type": "image_url",
+        "image_url": {
+            "url": f"data:image/jpeg;base64,{as_media(image).llm_base64(detail)}",
+            "detail": detail
+        }
+    }
@@ -0,0 +1,279 @@
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# 📈 Метрики процесса без внешних зависимостей: счётчики, gauge и гистограммы задержек.
+# Отдаём в текстовом формате Prometheus по HTTP (METRICS_PORT) и пишем JSON-снимок на диск.
+
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9108'))  # 0 — не поднимать HTTP
+SNAPSHOT_PATH = os.getenv('METRICS_SNAPSHOT_PATH', 'metrics_snapshot.json')
+SNAPSHOT_SECONDS = float(os.getenv('METRICS_SNAPSHOT_SECONDS', '60'))
+
+# от миллисекунд (хэш, дедуп) до минут (OCR больших фото, GPT с повторами)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()  # обновления идут из event loop, чтение — из HTTP-потока
+
+    def _key(self, labels: Dict[str, object]) -> LabelValues:
+        return tuple(str(labels.get(n, '')) for n in self.labelnames)
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, '', v) for key, v in self._values.items()]
+
+    def snapshot(self):
+        with self._lock:
+            return {','.join(k) or '_': v for k, v in self._values.items()}
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, function: Callable[[], float]):
+        # значение считается в момент чтения (например, длина очереди)
+        self._function = function
+
+    def _current(self) -> Dict[LabelValues, float]:
+        with self._lock:
+            values = dict(self._values)
+        if self._function is not None:
+            try:
+                values[()] = float(self._function())
+            except Exception as e:
+                print(f"⚠️ Метрика {self.name} не посчиталась: {e}")
+        return values
+
+    def samples(self):
+        return [(self.name, key, '', v) for key, v in self._current().items()]
+
+    def snapshot(self):
+        return {','.join(k) or '_': v for k, v in self._current().items()}
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * len(self.buckets)
+                self._sums[key] = 0.0
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._sums[key] += value
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def samples(self):
+        result = []
+        with self._lock:
+            for key, counts in self._counts.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    result.append((f'{self.name}_bucket', key, f'le="{_format_value(bound)}"', cumulative))
+                result.append((f'{self.name}_sum', key, '', self._sums[key]))
+                result.append((f'{self.name}_count', key, '', cumulative))
+        return result
+
+    def quantile(self, key: LabelValues, q: float) -> float:
+        # оценка по границам корзин — для JSON-снимка, точнее считает Prometheus
+        counts = self._counts.get(key)
+        if not counts:
+            return 0.0
+        total = sum(counts)
+        rank, cumulative = q * total, 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound if bound != float('inf') else self.buckets[-2]
+        return self.buckets[-2]
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                ','.join(key) or '_': {
+                    'count': sum(counts),
+                    'sum': round(self._sums[key], 3),
+                    'p50': self.quantile(key, 0.5),
+                    'p95': self.quantile(key, 0.95),
+                    'p99': self.quantile(key, 0.99),
+                }
+                for key, counts in self._counts.items()
+            }
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: Dict[str, object]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _get_or_create(self, cls, name, help_text, labelnames, **kwargs):
+        # повторная регистрация (импорт модуля дважды) возвращает ту же метрику
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = cls(name, help_text, labelnames, **kwargs)
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help_text, labelnames)
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, help_text, labelnames)
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for sample_name, key, extra, value in metric.samples():
+                lines.append(f'{sample_name}{_format_labels(metric.labelnames, key, extra)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self) -> dict:
+        return {
+            'timestamp': time.time(),
+            'metrics': {name: metric.snapshot() for name, metric in self._metrics.items()},
+        }
+
+
+registry = Registry()
+counter = registry.counter
+gauge = registry.gauge
+histogram = registry.histogram
+
+
+# --- экспорт ----------------------------------------------------------------
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        body = registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass  # без строки в логе на каждый scrape
+
+
+def start_http_server(port: int = METRICS_PORT, host: str = METRICS_HOST) -> Optional[ThreadingHTTPServer]:
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        print(f"⚠️ Не удалось поднять /metrics на {host}:{port}: {e}")
+        return None
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    print(f"📈 Метрики: http://{host}:{port}/metrics")
+    return server
+
+
+def write_snapshot(path: str = SNAPSHOT_PATH):
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(registry.snapshot(), f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)  # читатель не увидит полузаписанный файл
+
+
+def start_snapshot_writer(path: str = SNAPSHOT_PATH, interval: float = SNAPSHOT_SECONDS) -> Optional[threading.Thread]:
+    if not path or interval <= 0:
+        return None
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                write_snapshot(path)
+            except Exception as e:
+                print(f"⚠️ Не удалось записать снимок метрик: {e}")
+
+    thread = threading.Thread(target=loop, name='metrics-snapshot', daemon=True)
+    thread.start()
+    return thread
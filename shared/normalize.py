@@ -1,14 +1,151 @@
+import hashlib
+from functools import cached_property, lru_cache
+from typing import FrozenSet, Iterable, List, Sequence
+
 import regex as re  # 👈 используем модуль regex вместо re
 
+# Компилируем один раз, а не на каждый вызов
+_MENTION_RE = re.compile(r'@[a-z0-9_]+')
+_SYMBOLS_RE = re.compile(r'[^\p{L}\p{N}\s]+')  # Unicode-буквы и цифры
+_DIGITS_RE = re.compile(r'\d+')
+_SPACES_RE = re.compile(r'\s+')
+
+# Даты «12.05», «12/5», «12.05.2025», «12 мая» → один токен «дата1205», одинаковый при любой записи
+DATE_TOKEN = 'дата'
+_MONTH_STEMS = (('январ', 1), ('феврал', 2), ('март', 3), ('апрел', 4), ('мая', 5), ('май', 5), ('июн', 6),
+                ('июл', 7), ('август', 8), ('сентябр', 9), ('октябр', 10), ('ноябр', 11), ('декабр', 12))
+_DATE_NUM_RE = re.compile(r'(?<!\d)(\d{1,2})[./](\d{1,2})(?:[./]\d{2,4})?(?!\d)')
+_DATE_MONTH_RE = re.compile(r'(?<!\d)(\d{1,2})\s+(' + '|'.join(stem for stem, _ in _MONTH_STEMS) + r')\w*')
+_DATE_TOKEN_RE = re.compile(DATE_TOKEN + r'\d{4}')
+
+SHINGLE_SIZE = 3
 
-def normalize(text: str) -> str:
+
+def normalize(text: str, keep_digits: bool = False) -> str:
+    """
+    keep_digits — не заменять числа на # (для ключа дедупа: там важны даты и гонорары).
+    """
     if not text:
         return ''
 
     text = text.lower()
-    text = re.sub(r'@[a-z0-9_]+', '', text)
-    text = re.sub(r'[^\p{L}\p{N}\s]+', '', text)  # Unicode-буквы и цифры
-    text = re.sub(r'\d+', '#', text)
-    text = re.sub(r'\s+', ' ', text)
+    text = _MENTION_RE.sub('', text)
+    text = _SYMBOLS_RE.sub('', text)
+    if not keep_digits:
+        text = _DIGITS_RE.sub('#', text)
+    text = _SPACES_RE.sub(' ', text)
+
+    return text.strip()
+
+
+def _date_token(day: int, month: int, fallback: str) -> str:
+    if 1 <= day <= 31 and 1 <= month <= 12:
+        return f' {DATE_TOKEN}{day:02d}{month:02d} '
+    return fallback  # 12.30 — это время, не дата
+
+
+def _month_number(word: str) -> int:
+    return next((i for stem, i in _MONTH_STEMS if word.startswith(stem)), 0)
+
+
+def mark_dates(text: str) -> str:
+    # text уже в нижнем регистре
+    text = _DATE_NUM_RE.sub(lambda m: _date_token(int(m.group(1)), int(m.group(2)), m.group()), text)
+    return _DATE_MONTH_RE.sub(lambda m: _date_token(int(m.group(1)), _month_number(m.group(2)), m.group()), text)
+
+
+def dedup_text(text: str) -> str:
+    """
+    Нормализация для ключа дедупа: числа остаются, даты приведены к одному виду.
+    Индекс держит записи неделями, и новый набор по старому шаблону с другой датой
+    не должен совпасть со старым.
+    """
+    return normalize(mark_dates((text or '').lower()), keep_digits=True)
+
+
+def date_tokens(text: str) -> FrozenSet[str]:
+    # токены дат из dedup_text()
+    return frozenset(_DATE_TOKEN_RE.findall(text or ''))
+
+
+def word_shingles(tokens: Sequence[str], k: int = SHINGLE_SIZE) -> FrozenSet[str]:
+    # Короткий текст (меньше k слов) — один шингл из всех слов
+    if len(tokens) < k:
+        return frozenset({' '.join(tokens)}) if tokens else frozenset()
+    return frozenset(' '.join(tokens[i:i + k]) for i in range(len(tokens) - k + 1))
+
+
+@lru_cache(maxsize=65536)
+def _token_hash(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+# SimHash считаем «дорожками»: каждый бит хэша слова раскладываем в свою 32-битную дорожку
+# большого int, тогда сложение хэшей всех слов — одно сложение int на слово вместо цикла по 64 битам.
+_LANE = 32
+_LANE_MASK = (1 << _LANE) - 1
+_SPREAD = [sum(((b >> i) & 1) << (i * _LANE) for i in range(8)) for b in range(256)]
+
+
+@lru_cache(maxsize=65536)
+def _token_lanes(token: str) -> int:
+    h = _token_hash(token)
+    lanes = 0
+    for k in range(8):
+        lanes |= _SPREAD[(h >> (8 * k)) & 0xFF] << (k * 8 * _LANE)
+    return lanes
+
+
+def simhash(tokens: Iterable[str]) -> int:
+    """
+    64-битный SimHash по словам: у похожих текстов отличается мало бит.
+    Бит = 1, если у большинства слов этот бит хэша равен 1.
+    """
+    total, count = 0, 0
+    for token in tokens:
+        total += _token_lanes(token)
+        count += 1
+    value = 0
+    for bit in range(64):
+        if ((total >> (bit * _LANE)) & _LANE_MASK) * 2 > count:
+            value |= 1 << bit
+    return value
+
+
+class Fingerprint:
+    """
+    Нормализованная строка и токены считаются сразу — они нужны всем (эвристика, ключи кэша).
+    Остальное — при первом обращении и один раз: шинглы и ключ с датами берёт только дедуп,
+    SimHash — только тот, кто его попросит.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.normalized = normalize(text)
+        self.tokens = tuple(self.normalized.split())
+
+    @cached_property
+    def shingles(self) -> FrozenSet[str]:
+        return word_shingles(self.tokens)
+
+    @cached_property
+    def simhash(self) -> int:
+        return simhash(self.tokens)
+
+    @cached_property
+    def dedup_normalized(self) -> str:
+        return dedup_text(self.text)
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(text: str) -> Fingerprint:
+    """
+    Отпечаток текста для дедупа, ключей кэша и матчинга.
+    Результат кэшируется — один и тот же текст по пути через пайплайн считается один раз.
+    """
+    return Fingerprint(text or '')
+
 
-    return text.strip()
\ No newline at end of file
+def fingerprint_many(texts: Iterable[str]) -> List[Fingerprint]:
+    # Пачкой: хэши слов общие между текстами (lru_cache), повторы текстов не пересчитываются
+    return [fingerprint(t or '') for t in texts]
@@ -1,10 +1,106 @@
-from PIL import Image
+import os
+from PIL import Image, ImageChops, ImageOps
 import pytesseract
 
+# 🧼 Подготовка картинки под Tesseract
+PREPROCESS = os.getenv('OCR_PREPROCESS', '1') == '1'
+TEXT_GATE = os.getenv('OCR_TEXT_GATE', '1') == '1'
+
+# Tesseract лучше всего читает строки высотой ~20–40px (≈300 DPI для печатного текста):
+# мелкие скрины увеличиваем, огромные фото уменьшаем
+MIN_SIDE = 1000
+TARGET_SIDE = 1800
+MAX_SIDE = 2600
+
+# Детектор текста: строка уменьшенной картинки «текстовая», если в ней много переходов чёрное/белое
+GATE_WIDTH = 320
+GATE_MIN_TRANSITIONS = int(os.getenv('OCR_GATE_MIN_TRANSITIONS', '12'))
+GATE_MIN_ROWS = int(os.getenv('OCR_GATE_MIN_ROWS', '6'))
+
+
+def otsu_threshold(gray):
+    hist = gray.histogram()[:256]
+    total = sum(hist)
+    sum_all = sum(i * h for i, h in enumerate(hist))
+    sum_bg, weight_bg, best, threshold = 0.0, 0, -1.0, 127
+    for i, h in enumerate(hist):
+        weight_bg += h
+        if weight_bg == 0:
+            continue
+        weight_fg = total - weight_bg
+        if weight_fg == 0:
+            break
+        sum_bg += i * h
+        mean_bg = sum_bg / weight_bg
+        mean_fg = (sum_all - sum_bg) / weight_fg
+        between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+        if between > best:
+            best, threshold = between, i
+    return threshold
+
+
+def has_text(img):
+    """
+    Дешёвая проверка «есть ли на картинке текст»: бинаризуем уменьшенную копию и считаем строки
+    с частыми переходами (буквы дают много коротких штрихов, лица и фон — плавные области).
+    """
+    gray = ImageOps.grayscale(img)
+    w, h = gray.size
+    if w > GATE_WIDTH:
+        gray = gray.resize((GATE_WIDTH, max(1, h * GATE_WIDTH // w)))
+    t = otsu_threshold(gray)
+    bw = gray.point(lambda p: 255 if p > t else 0)
+    width, height = bw.size
+    if width < 2:
+        return False
+
+    # переходы = пиксели, отличающиеся от соседа слева; BOX-ресайз до ширины 1 даёт среднее по строке
+    diff = ImageChops.difference(bw.crop((0, 0, width - 1, height)), bw.crop((1, 0, width, height)))
+    row_means = diff.resize((1, height), Image.BOX).getdata()
+    min_mean = GATE_MIN_TRANSITIONS * 255 / (width - 1)
+    text_rows = sum(1 for m in row_means if m >= min_mean)
+    return text_rows >= GATE_MIN_ROWS
+
+
+def preprocess_for_ocr(img):
+    """
+    Оттенки серого → масштаб под оптимальный для Tesseract размер → бинаризация по Оцу.
+    """
+    gray = ImageOps.autocontrast(ImageOps.grayscale(img))
+    w, h = gray.size
+    longest = max(w, h)
+    if longest < MIN_SIDE or longest > MAX_SIDE:
+        scale = TARGET_SIDE / longest
+        gray = gray.resize((max(1, int(w * scale)), max(1, int(h * scale))), Image.LANCZOS)
+    t = otsu_threshold(gray)
+    return gray.point(lambda p: 255 if p > t else 0)
+
+
+def prepare_image(img, preprocess=PREPROCESS, gate=TEXT_GATE):
+    """
+    None — текста на картинке нет, OCR не нужен.
+    """
+    if gate and not has_text(img):
+        return None
+    return preprocess_for_ocr(img) if preprocess else img
+
+
 def extract_text_from_image(image_path):
     try:
-        text = pytesseract.image_to_string(Image.open(image_path), lang='rus+eng')
+        with Image.open(image_path) as img:
+            prepared = prepare_image(img)
+            if prepared is None:
+                print("🖼️ На фото нет текста — OCR пропущен")
+                return ''
+            text = pytesseract.image_to_string(prepared, lang='rus+eng')
         return text.strip()
     except Exception as e:
         print(f"❌ Ошибка OCR: {e}")
-        return ''
\ No newline at end of file
+        return ''
+
+
+async def extract_text_from_image_async(image):
+    # То же самое, но в пуле OCR-воркеров: event loop не ждёт tesseract.
+    # image — путь, байты или MediaBlob (в воркер уходят байты из памяти, файл не нужен)
+    from shared.ocr_pool import get_pool  # ocr_pool сам импортирует подготовку картинок отсюда
+    return await get_pool().recognize(getattr(image, 'source', image))
@@ -0,0 +1,147 @@
+import asyncio
+import io
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Union
+
+import pytesseract
+from PIL import Image
+from shared.ocr_extractor import prepare_image
+
+# 🏭 Пул долгоживущих OCR-процессов.
+# Каждый воркер один раз поднимает движок, а бот отдаёт задачи через async API и не блокирует event loop.
+# Модели rus+eng держатся в памяти между задачами только с tesserocr — его нужно поставить отдельно
+# (pip install tesserocr, собирается против установленного tesseract). Без него воркеры работают через
+# pytesseract: event loop так же свободен, но на каждую картинку запускается отдельный процесс tesseract.
+# Воркеры стартуют через spawn (на macOS по умолчанию) — точка входа бота должна быть под
+# if __name__ == "__main__" (см. mirror.py).
+
+OCR_LANG = 'rus+eng'
+OCR_WORKERS = int(os.getenv('OCR_WORKERS', str(os.cpu_count() or 2)))
+OCR_TIMEOUT = float(os.getenv('OCR_TIMEOUT', '30'))
+
+ImageSource = Union[str, bytes]
+
+# --- воркер -----------------------------------------------------------------
+
+_api = None  # tesserocr.PyTessBaseAPI внутри воркера
+
+
+def _init_worker(lang: str, tesseract_cmd: str):
+    global _api
+    pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    try:
+        import tesserocr
+        _api = tesserocr.PyTessBaseAPI(lang=lang)
+    except Exception as e:
+        _api = None  # нет tesserocr — работаем через pytesseract (процесс tesseract на задачу)
+        print(f"⚠️ tesserocr недоступен ({e}) — OCR через pytesseract, модели не кэшируются")
+
+
+def _open(source: ImageSource) -> Image.Image:
+    if isinstance(source, (bytes, bytearray)):
+        return Image.open(io.BytesIO(source))
+    return Image.open(source)
+
+
+def _ocr_job(source: ImageSource, lang: str) -> str:
+    with _open(source) as img:
+        # предобработка и проверка «есть ли текст» тоже здесь, в воркере, а не в event loop
+        prepared = prepare_image(img)
+        if prepared is None:
+            return ''
+        if _api is not None:
+            _api.SetImage(prepared)
+            return _api.GetUTF8Text().strip()
+        return pytesseract.image_to_string(prepared, lang=lang).strip()
+
+
+# --- сервис -----------------------------------------------------------------
+
+class OCRPool:
+    def __init__(self, workers: int = OCR_WORKERS, lang: str = OCR_LANG, timeout: float = OCR_TIMEOUT):
+        self.workers = workers
+        self.lang = lang
+        self.timeout = timeout
+        self.restarts = 0
+        self._lock = threading.Lock()
+        self._stuck = 0  # задачи, которые не уложились в таймаут, но всё ещё занимают воркер
+        self.executor = self._new_executor()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # tesseract_cmd берём из родителя (mirror.py задаёт путь) — при spawn воркеры его не наследуют
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(self.lang, pytesseract.pytesseract.tesseract_cmd),
+        )
+
+    def _restart(self, broken: ProcessPoolExecutor, reason: str):
+        """
+        Пул сломан (воркер упал — например, segfault в tesserocr) или все воркеры заняты зависшими
+        задачами: останавливаем старые процессы и поднимаем новый пул.
+        """
+        with self._lock:
+            if self.executor is not broken:
+                return  # уже перезапустил другой вызов
+            self.executor = self._new_executor()
+            self._stuck = 0
+            self.restarts += 1
+        print(f"♻️ OCR-пул перезапущен ({reason})")
+        # зависшую задачу у ProcessPoolExecutor не отменить — только убить процесс (_processes — внутреннее поле)
+        for process in list((getattr(broken, '_processes', None) or {}).values()):
+            process.terminate()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _release_stuck(self, executor: ProcessPoolExecutor):
+        def done(_: Future):
+            with self._lock:
+                if self.executor is executor and self._stuck > 0:
+                    self._stuck -= 1
+        return done
+
+    async def recognize(self, source: ImageSource, timeout: Optional[float] = None) -> str:
+        """
+        Текст с картинки (путь или байты). Ошибка или таймаут — пустая строка, как в extract_text_from_image.
+        """
+        executor = self.executor
+        timeout = timeout or self.timeout
+        try:
+            job = executor.submit(_ocr_job, source, self.lang)
+            return await asyncio.wait_for(asyncio.wrap_future(job), timeout=timeout)
+        except asyncio.TimeoutError:
+            print(f"⏱️ OCR не уложился в {timeout}s — пропускаем")
+            # задача продолжает занимать воркер, пока не закончится сама
+            with self._lock:
+                self._stuck += 1
+                all_stuck = self.executor is executor and self._stuck >= self.workers
+            job.add_done_callback(self._release_stuck(executor))
+            if all_stuck:
+                self._restart(executor, f"все воркеры ({self.workers}) заняты зависшими задачами")
+            return ''
+        except BrokenProcessPool as e:
+            print(f"❌ OCR-воркер упал: {e}")
+            self._restart(executor, "воркер упал")
+            return ''
+        except Exception as e:
+            print(f"❌ Ошибка OCR: {e}")
+            return ''
+
+    async def recognize_batch(self, sources: List[ImageSource], timeout: Optional[float] = None) -> List[str]:
+        # задачи расходятся по всем воркерам параллельно
+        return list(await asyncio.gather(*(self.recognize(s, timeout) for s in sources)))
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+_default_pool: Optional[OCRPool] = None
+
+
+def get_pool() -> OCRPool:
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = OCRPool()
+    return _default_pool
@@ -0,0 +1,100 @@
+import json
+from dotenv import load_dotenv
+from shared.llm_cache import get_cache, make_key
+from shared.media import image_content
+from shared.llm_client import chat_completion
+from telegram_bot.format_casting_template import TEMPLATE_FIELDS
+
+load_dotenv()  # загружает переменные из .env
+
+MODEL = "gpt-4o-mini"
+PROMPT_VERSION = "analyze_casting/1"  # менять при правке промпта или схемы — сбрасывает кэш
+
+# 📐 Структурированный ответ: флаг кастинга + поля шаблона
+CASTING_SCHEMA = {
+    "name": "casting",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "is_casting": {"type": "boolean"},
+            **{key: {"type": "string"} for key, _ in TEMPLATE_FIELDS},
+        },
+        "required": ["is_casting", *[key for key, _ in TEMPLATE_FIELDS]],
+        "additionalProperties": False,
+    },
+}
+
+
+# 🔍 Классификация + извлечение полей одним запросом
+async def analyze_casting(text, image=None):
+    """
+    Возвращает dict с is_casting и полями шаблона (project, role, date, time, fee, location, contact, extra)
+    или None, если GPT не ответил — тогда вызывающий код откатывается на is_casting_ai + format_casting_template.
+    """
+    # Поля содержат даты и контакты, которые normalize() затирает, поэтому сырой текст тоже в ключе
+    cache_key = make_key(text, PROMPT_VERSION, MODEL, image, extra=text or "")
+    cached = get_cache().get(cache_key)
+    if cached is not None:
+        print(f"🗄️ AI ответ из кэша: кастинг={cached.get('is_casting')}")
+        return cached
+
+    content = [{
+        "type": "text",
+        "text": f"""Ты анализируешь текст и изображение, чтобы определить, является ли это сообщение **объявлением кастинга**, и если да — разложить его по полям.
+
+1. **Сначала** прочитай текст сообщения.
+2. Затем, **если на изображении есть текст — учти его.** Визуальные элементы (лица, эмоции, фон) **игнорируй полностью.**
+3. is_casting = true, если в тексте (или на фото с текстом) есть **минимум 1 из 5 пунктов**:
+— проект/тип съёмки,
+— типаж/роль,
+— дата съёмки,
+- время съемок,
+— локация,
+— контакт для связи.
+Иначе is_casting = false.
+
+Поля (без вступлений и пояснений, только значения):
+project — название/тип проекта
+role — описание роли/типажа
+date — дата съёмок
+time — время
+fee — гонорар
+location — город/место
+contact — ссылка/никнейм
+extra — всё остальное
+
+Если какое-то поле не указано — ставь прочерк "-".
+Если это не кастинг — все поля "-".
+
+Вот сообщение:
+{text}
+"""
+    }]
+
+    if image:
+        try:
+            # image — путь или MediaBlob; уменьшенный JPEG считается один раз на сообщение
+            content.append(image_content(image))
+        except Exception as e:
+            print(f"⚠️ Не удалось прочитать фото: {e}")
+
+    try:
+        print("🤖 Отправка запроса в GPT-4o (классификация + шаблон)...")
+        response = await chat_completion(
+            model=MODEL,
+            messages=[{"role": "user", "content": content}],
+            response_format={"type": "json_schema", "json_schema": CASTING_SCHEMA},
+            max_tokens=1000
+        )
+        message = response.choices[0].message
+        if getattr(message, "refusal", None):
+            print(f"⚠️ GPT отказался отвечать: {message.refusal}")
+            return None
+        result = json.loads(message.content)
+        print(f"🧠 AI ответ: кастинг={result.get('is_casting')}")
+        get_cache().set(cache_key, result)
+        return result
+    except Exception as e:
+        print(f"❌ Ошибка AI-анализа: {e}")
+        return None
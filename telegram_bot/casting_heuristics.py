@@ -0,0 +1,119 @@
+import os
+import re
+from typing import Dict, List, Tuple
+
+from shared.normalize import fingerprint
+
+# ⚡ Локальный скоринг «кастинг или нет» до GPT.
+# yes/no решаем сами, в is_casting_ai уходит только unsure.
+
+YES_SCORE = float(os.getenv("HEURISTIC_YES_SCORE", "6"))
+NO_SCORE = float(os.getenv("HEURISTIC_NO_SCORE", "1"))
+# shadow: вердикт только считаем и сверяем с GPT, но решение всё равно за GPT
+SHADOW = os.getenv("HEURISTIC_SHADOW", "0") == "1"
+
+MIN_TEXT_LEN = 15
+
+# Слова ищем в normalize()-тексте (без пунктуации, цифры → #) как начало слова:
+# «рост» находит «роста», но не «просто»
+STRONG_KEYWORDS = [
+    "кастинг", "casting", "кастинге", "самопроб", "пробы", "ищем актер", "ищем актрис",
+    "требуются актер", "требуется актер", "массовк", "актерский состав",
+    "кастинг директор", "кастингдиректор",
+]
+WEAK_KEYWORDS = [
+    "съемк", "съёмк", "роль", "роли", "типаж", "актер", "актёр", "актрис", "модел",
+    "реклам", "клип", "фильм", "сериал", "короткометраж", "проект", "гонорар", "оплата",
+    "тг", "тенге", "возраст", "рост", "локация", "фотосесси", "ищем", "требуются", "требуется",
+]
+NEGATIVE_KEYWORDS = [
+    "спасибо", "благодарю", "рахмет", "поздравляю", "с днем рождения", "подписывайтесь",
+    "продам", "куплю", "аренда", "сдаю",
+]
+
+# Шаблоны — по сырому тексту в нижнем регистре
+DATE_RE = re.compile(
+    r"\b\d{1,2}[./]\d{1,2}(?:[./]\d{2,4})?\b"
+    r"|\b\d{1,2}\s+(?:январ|феврал|март|апрел|ма[яй]|июн|июл|август|сентябр|октябр|ноябр|декабр)"
+    r"|\b(?:сегодня|завтра|послезавтра)\b"
+)
+TIME_RE = re.compile(r"\b(?:[01]?\d|2[0-3])[:.][0-5]\d\b|\bс\s+\d{1,2}\s+до\s+\d{1,2}\b")
+FEE_RE = re.compile(r"\d[\d\s]*(?:тг|тенге|₸|kzt|руб|₽|\$|usd)|гонорар|оплата|\d+\s?(?:000|к)\b")
+PHONE_RE = re.compile(r"(?:\+7|\b8)[\s\-(]*\d{3}[\s\-)]*\d{3}[\s\-]*\d{2}[\s\-]*\d{2}")
+CONTACT_RE = re.compile(r"@[a-z0-9_]{4,}|t\.me/|wa\.me/|instagram\.com/")
+
+
+def score_casting(text: str, ocr_text: str = '', has_image: bool = False) -> Tuple[str, float, List[str]]:
+    """
+    Возвращает (вердикт 'yes'/'no'/'unsure', балл, сработавшие сигналы).
+    """
+    raw = f"{text or ''}\n{ocr_text or ''}".lower()
+    norm = f"{fingerprint(text or '').normalized} {fingerprint(ocr_text or '').normalized}".strip()
+    # пробел перед каждым словом; "#тг" (цифры + тг) тоже считаем словом "тг"
+    words = " " + norm.replace("#", " ")
+
+    signals = []
+    score = 0.0
+
+    strong = [k for k in STRONG_KEYWORDS if f" {k}" in words]
+    if strong:
+        score += 3 + min(len(strong) - 1, 1)
+        signals.append(f"strong:{strong[0]}")
+    weak = [k for k in WEAK_KEYWORDS if f" {k}" in words]
+    if weak:
+        score += min(len(weak), 3)
+        signals.append(f"weak:{len(weak)}")
+
+    for name, pattern in (("date", DATE_RE), ("time", TIME_RE), ("fee", FEE_RE),
+                          ("phone", PHONE_RE), ("contact", CONTACT_RE)):
+        if pattern.search(raw):
+            score += 1
+            signals.append(name)
+
+    negative = [k for k in NEGATIVE_KEYWORDS if f" {k}" in words]
+    if negative and not strong:
+        score -= 2
+        signals.append(f"negative:{negative[0]}")
+
+    # Картинка без распознанного текста — может быть афишей, которую OCR не осилил
+    if has_image and not fingerprint(ocr_text or '').normalized:
+        return ("yes" if score >= YES_SCORE else "unsure"), score, signals + ["image"]
+
+    if score >= YES_SCORE:
+        return "yes", score, signals
+    # короткий текст отбрасываем, только если балл не дотянул до yes
+    if len(norm) < MIN_TEXT_LEN:
+        return "no", score, signals + ["short"]
+    if score <= NO_SCORE:
+        return "no", score, signals
+    return "unsure", score, signals
+
+
+class ShadowStats:
+    """
+    Сверка локального вердикта с GPT: сколько yes/no подтвердились.
+    """
+
+    def __init__(self):
+        self.counts: Dict[Tuple[str, bool], int] = {}
+
+    def record(self, verdict: str, llm_is_casting: bool):
+        key = (verdict, bool(llm_is_casting))
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+    def precision(self, verdict: str) -> float:
+        agree = self.counts.get((verdict, verdict == "yes"), 0)
+        total = agree + self.counts.get((verdict, verdict != "yes"), 0)
+        return agree / total if total else 0.0
+
+    def report(self) -> Dict[str, float]:
+        return {
+            "yes_total": self.counts.get(("yes", True), 0) + self.counts.get(("yes", False), 0),
+            "yes_precision": round(self.precision("yes"), 3),
+            "no_total": self.counts.get(("no", True), 0) + self.counts.get(("no", False), 0),
+            "no_precision": round(self.precision("no"), 3),
+            "unsure_total": self.counts.get(("unsure", True), 0) + self.counts.get(("unsure", False), 0),
+        }
+
+
+shadow_stats = ShadowStats()
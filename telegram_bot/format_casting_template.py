@@ -1,11 +1,13 @@
-import base64
-from openai import OpenAI
+import html
 from dotenv import load_dotenv
-import os
+from shared.llm_cache import get_cache, make_key
+from shared.media import image_content
+from shared.llm_client import LLM_RETRIES, chat_completion
 
 load_dotenv()  # загружает переменные из .env
 
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+MODEL = "gpt-4o-mini"
+PROMPT_VERSION = "format_casting_template/1"  # менять при правке промпта — сбрасывает кэш
 
 # 🔹 Маркеры отказа
 REFUSAL_MARKERS = [
@@ -21,8 +23,39 @@ REFUSAL_MARKERS = [
 ]
 MAX_ATTEMPTS = 10
 
+# 🧩 Поля шаблона в порядке вывода: ключ → подпись
+TEMPLATE_FIELDS = [
+    ("project", "🎨 Проект"),
+    ("role", "👤 Роль/Типаж"),
+    ("date", "🗓 Дата съёмок"),
+    ("time", "⏰ Время"),
+    ("fee", "💰 Гонорар"),
+    ("location", "📍 Локация"),
+    ("contact", "📬 Контакт"),
+    ("extra", "📝 Доп. информация"),
+]
+
+
+def render_casting_template(fields):
+    """
+    Локальная сборка шаблона из полей, которые вернул GPT (см. analyze_casting).
+    Формат всегда один и тот же, пустые поля — прочерк.
+    """
+    lines = []
+    for key, label in TEMPLATE_FIELDS:
+        value = str(fields.get(key) or "").strip() or "-"
+        lines.append(f"{label}: {html.escape(value, quote=False)}")
+    return "\n".join(lines)
+
+
+async def format_casting_template(text, image=None):
+    # Шаблон содержит даты и контакты, которые normalize() затирает, поэтому сырой текст тоже в ключе
+    cache_key = make_key(text, PROMPT_VERSION, MODEL, image, extra=text or "")
+    cached = get_cache().get(cache_key)
+    if cached is not None:
+        print("🗄️ Шаблон из кэша")
+        return cached
 
-async def format_casting_template(text, image_path=None):
     base_content = [
         {
             "type": "text",
@@ -52,17 +85,10 @@ async def format_casting_template(text, image_path=None):
         }
     ]
 
-    if image_path:
+    if image:
         try:
-            with open(image_path, "rb") as img:
-                base64_img = base64.b64encode(img.read()).decode("utf-8")
-            base_content.append({
-                "type": "image_url",
-                "image_url": {
-                    "url": f"data:image/jpeg;base64,{base64_img}",
-                    "detail": "low"
-                }
-            })
+            # image — путь или MediaBlob; уменьшенный JPEG считается один раз на сообщение
+            base_content.append(image_content(image))
         except Exception as e:
             print(f"⚠️ Не удалось прикрепить изображение к шаблонизации: {e}")
 
@@ -70,8 +96,8 @@ async def format_casting_template(text, image_path=None):
     while attempt <= MAX_ATTEMPTS:
         try:
             print(f"🔁 Попытка форматирования #{attempt}")
-            response = openai_client.chat.completions.create(
-                model="gpt-4o-mini",
+            response = await chat_completion(
+                model=MODEL,
                 messages=[{"role": "user", "content": base_content}],
                 max_tokens=1000
             )
@@ -79,9 +105,11 @@ async def format_casting_template(text, image_path=None):
             rl = result.lower()
 
             if result and not any(marker in rl for marker in REFUSAL_MARKERS):
+                get_cache().set(cache_key, result)
                 return result
             else:
                 print("⚠️ Получен отказ/извинение или пустой ответ. Повторяем...")
+                LLM_RETRIES.inc(caller="format_casting_template")
                 attempt += 1
 
         except Exception as e:
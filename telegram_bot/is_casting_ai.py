@@ -1,17 +1,21 @@
-import base64
-from openai import OpenAI
 from dotenv import load_dotenv
-import os
+from shared.llm_cache import get_cache, make_key
+from shared.media import image_content
+from shared.llm_client import chat_completion
 
 load_dotenv()  # загружает переменные из .env
 
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-# Инициализация клиента
-openai_client = OpenAI()
+MODEL = "gpt-4o-mini"
+PROMPT_VERSION = "is_casting_ai/1"  # менять при правке промпта — сбрасывает кэш
 
 # 🔍 AI-фильтрация
-async def is_casting_ai(text, image_path=None):
+async def is_casting_ai(text, image=None):
+    cache_key = make_key(text, PROMPT_VERSION, MODEL, image)
+    cached = get_cache().get(cache_key)
+    if cached is not None:
+        print(f"🗄️ AI ответ из кэша: {'да' if cached else 'нет'}")
+        return cached
+
     content = [{
         "type": "text",
         "text": f"""Ты анализируешь текст и изображение, чтобы определить, является ли это сообщение **объявлением кастинга**.
@@ -36,30 +40,27 @@ async def is_casting_ai(text, image_path=None):
 """
     }]
 
-    if image_path:
+    if image:
         try:
-            with open(image_path, "rb") as img:
-                base64_img = base64.b64encode(img.read()).decode("utf-8")
-            content.append({
-                "type": "image_url",
-                "image_url": {
-                    "url": f"data:image/jpeg;base64,{base64_img}",
-                    "detail": "low"
-                }
-            })
+            # image — путь или MediaBlob; уменьшенный JPEG считается один раз на сообщение
+            content.append(image_content(image))
         except Exception as e:
             print(f"⚠️ Не удалось прочитать фото: {e}")
 
     try:
         print("🤖 Отправка запроса в GPT-4o...")
-        response = openai_client.chat.completions.create(
-            model="gpt-4o-mini",
+        response = await chat_completion(
+            model=MODEL,
             messages=[{"role": "user", "content": content}],
             max_tokens=5
         )
         reply = response.choices[0].message.content.lower()
         print(f"🧠 AI ответ: {reply}")
-        return "да" in reply
+        verdict = "да" in reply
+        get_cache().set(cache_key, verdict)
+        return verdict
     except Exception as e:
+        # не «не кастинг»: дедуп уже запомнил текст, и False потерял бы кастинг вместе со всеми репостами.
+        # Пробрасываем — стадия упадёт, воркер вернёт задачу в очередь (nack) и повторит позже
         print(f"❌ Ошибка AI-фильтрации: {e}")
-        return False
\ No newline at end of file
+        raise
\ No newline at end of file
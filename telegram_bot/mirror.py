@@ -1,17 +1,15 @@
 from telethon import TelegramClient, events
-from PIL import Image
+import asyncio
 import os
 from dotenv import load_dotenv
-import requests
-import base64
-from openai import OpenAI
 import pytesseract
 pytesseract.pytesseract.tesseract_cmd = '/opt/homebrew/bin/tesseract'
-import json
-from shared.isDuplicateCasting import is_duplicate_casting
-from shared.ocr_extractor import extract_text_from_image
-from telegram_bot.format_casting_template import format_casting_template
-from telegram_bot.is_casting_ai import is_casting_ai
+from shared.job_queue import get_queue
+from shared.metrics import gauge, start_http_server, start_snapshot_writer
+from telegram_bot.recorder import RECORD_PATH, record_message
+from telegram_bot.scheduler import LLM_BACKPRESSURE_IN_FLIGHT, SourceScheduler
+from telegram_bot.stages import build_pipeline, is_tracked_source, message_thread_id
+from telegram_bot.worker import run_worker
 
 # 🚀 Загрузка переменных
 load_dotenv()
@@ -21,11 +19,9 @@ api_hash = os.getenv("API_HASH")
 bot_token = os.getenv("BOT_TOKEN")
 chat_id = int(os.getenv("DESTINATION_CHAT_ID"))
 thread_id = int(os.getenv("DESTINATION_THREAD_ID"))
-openai_key = os.getenv("OPENAI_API_KEY")
 
 # 🤖 Инициализация клиентов
 client = TelegramClient("mirror_session", api_id, api_hash)
-openai_client = OpenAI(api_key=openai_key)
 
 # 🎯 Источники в формате строк: "chatId_threadId"
 source_threads = {
@@ -49,131 +45,83 @@ source_without_topic = [
     -1002144305952 # pve
 ]
 
+# ⚖️ Вес источника в очереди: профильные кастинг-каналы важнее больших общих чатов.
+# Кого нет в списке — вес 1. Итоговый вес ещё умножается на долю опубликованных кастингов.
+source_weights = {
+    -1001185887859: 3,  # aktery.castingi.modeling
+    -1001496435905: 3,  # кастинги казахстан алматы
+    -1002637607696: 3,  # kazakhstan casting club(astana)
+    -1002111636925: 3,  # кастинг в астане
+    -1002222308517: 3,  # zhaniya kaz casting hub
+    -1001228544389: 1,  # сообщество кинематографистов
+    -1001283285008: 1,  # все о кино
+}
+
 # 🛁 Все источники
 all_sources = list({int(s.split('_')[0]) for s in source_threads}) + source_without_topic
 
-# 🔁 Обработка сообщений
+# ⚙️ Конфиг для стадий пайплайна
+mirror_config = {
+    "source_threads": source_threads,
+    "source_without_topic": source_without_topic,
+    "bot_token": bot_token,
+    "chat_id": chat_id,
+    "thread_id": thread_id,
+    # separate — is_casting_ai + format_casting_template, combined — один запрос analyze_casting
+    "llm_mode": os.getenv("LLM_MODE", "separate"),
+}
+
+# 🧱 Стадии: источник → preview → дедуп афиш → OCR → дедуп → дешёвый фильтр → GPT → шаблон → публикация
+pipeline = build_pipeline(report_every=int(os.getenv("PIPELINE_REPORT_EVERY", "50")))
+
+# 📥 Хэндлер только проверяет источник и кладёт сообщение в очередь — обработка в воркерах
+jobs = get_queue()
+new_jobs = asyncio.Event()
+MIRROR_WORKERS = int(os.getenv("MIRROR_WORKERS", "4"))
+
+
 @client.on(events.NewMessage(chats=all_sources))
 async def handler(event):
-    try:
-        message = event.message
-
-        # 🔍 Проверка источника
-        chat_id_only = event.chat_id
-        actual_thread_id = (
-            getattr(message, 'thread_id', None)
-            or getattr(message, 'message_thread_id', None)
-            or (message.reply_to.reply_to_msg_id if message.reply_to else None)
-        )
-        chat_id_str = f"{chat_id_only}_{actual_thread_id}"
-
-        if chat_id_only in source_without_topic:
-            print(f"✅ Источник без темы: {chat_id_only}")
-        elif chat_id_str in source_threads:
-            print(f"✅ Проходит фильтр: {chat_id_str}")
-        else:
-            print(f"❌ {chat_id_str} не в отслеживаемых — пропускаем.")
-            return
-
-        text = (getattr(message, 'message', '') or
-                getattr(message, 'text', '') or
-                getattr(message, 'raw_text', ''))
-        sender = await event.get_chat()
-        sender_name = getattr(sender, 'title', 'Источник неизвестен')
-        print(f"\n📅 Новое сообщение из: {sender_name}")
-        if text:
-            print(f"📝 Текст: {text[:100]}...")
-
-        image_path = None
-        if message.photo:
-            print("📷 Обнаружено фото, загружаем...")
-            image_path = await message.download_media()
-            print(f"⬇️ Скачано: {image_path}")
-
-            # 🛡️ Защита от preview Telegram (слишком маленькие/лёгкие)
-            if image_path:
-                file_size = os.path.getsize(image_path)
-                try:
-                    with Image.open(image_path) as img:
-                        width, height = img.size
-                except:
-                    width, height = 0, 0
-
-                if file_size < 15000 or (width <= 150 and height <= 150):
-                    print(f"⚠️ Фото — Telegram preview ({width}x{height}, {file_size} bytes). Удаляем.")
-                    os.remove(image_path)
-                    image_path = None
-
-        is_casting = await is_casting_ai(text, image_path)
-        if not is_casting:
-            print("❌ Не кастинг")
-            if image_path:
-                os.remove(image_path)
-            return
-        print("✅ Кастинг подтверждён")
-
-        # 🔁 Проверка на дубликат по тексту + OCR
-        ocr_text = extract_text_from_image(image_path) if image_path else ''
-        if is_duplicate_casting(text, ocr_text):
-            print("🔁 Кастинг уже был. Пропускаем.")
-            if image_path:
-                os.remove(image_path)
-            return
-
-        # 🖼️ Логика “оставить фото”
-        triggers = [
-            "как на фото", "как на картинке", "как на изображении",
-            "см. фото", "смотри фото", "см. картинку",
-            "like the photo", "as in the photo", "see photo"
-        ]
-        lc_text = (text or "").lower()
-        lc_ocr = (ocr_text or "").lower()
-        keep_photo = any(t in lc_text for t in triggers) or any(t in lc_ocr for t in triggers)
-
-        # ✨ Шаблон
-        formatted = await format_casting_template(text, image_path)
-
-        # 💬 Цитата источника
-        quote_html = f"<blockquote>Источник(Telegram): {sender_name}</blockquote>"
-        final_message = f"{formatted}\n\n{quote_html}"
-
-        # 🔗 РЕШЕНИЕ: отправляем фото капшеном, если нужно оставить изображение
-        if image_path and keep_photo:
-            print("🖼️ Отправляем шаблон с фото (caption).")
-            url = f"https://api.telegram.org/bot{bot_token}/sendPhoto"
-            with open(image_path, 'rb') as img_file:
-                files = {"photo": img_file}
-                data = {
-                    "chat_id": chat_id,
-                    "message_thread_id": thread_id,
-                    "caption": final_message,
-                    "parse_mode": "HTML"
-                }
-                resp = requests.post(url, data=data, files=files, timeout=30)
-            print(f"📤 Фото+капшен отправлены. Статус: {resp.status_code}")
-        else:
-            # как раньше — просто текст
-            data = {
-                "chat_id": chat_id,
-                "message_thread_id": thread_id,
-                "text": final_message,
-                "parse_mode": "HTML"
-            }
-            resp = requests.post(
-                f"https://api.telegram.org/bot{bot_token}/sendMessage",
-                json=data, timeout=30
-            )
-            print(f"📤 Сообщение отправлено. Статус: {resp.status_code}")
-
-        if image_path:
-            try:
-                os.remove(image_path)
-            except Exception as e:
-                print(f"⚠️ Не удалось удалить временное фото: {e}")
-
-    except Exception as e:
-        print(f"❌ Ошибка: {e}")
-
-print("🚀 Бот запущен. Слушаем кастинги...")
-client.start()
-client.run_until_disconnected()
+    # чужие темы форумов отсекаем здесь: иначе воркер сделает лишний get_messages на каждое
+    if not is_tracked_source(event.chat_id, message_thread_id(event.message), mirror_config):
+        return
+    if jobs.enqueue(event.chat_id, event.message.id):
+        new_jobs.set()
+        if RECORD_PATH:
+            # 🎙️ корпус для нагрузочного replay (benchmarks/replay_mirror.py)
+            await record_message(event.message)
+
+
+def llm_overloaded():
+    llm = pipeline.stage("llm")
+    return llm is not None and llm.in_flight >= LLM_BACKPRESSURE_IN_FLIGHT
+
+
+scheduler = SourceScheduler(jobs, source_weights, pressure=llm_overloaded)
+
+# 📈 Метрики: /metrics в формате Prometheus + JSON-снимок раз в METRICS_SNAPSHOT_SECONDS
+gauge('mirror_jobs_depth', 'Задач в очереди (ждут или в работе)').set_function(jobs.depth)
+gauge('mirror_llm_in_flight', 'Сообщений внутри стадии llm').set_function(lambda: pipeline.stage("llm").in_flight)
+
+
+async def fetch_message(chat, message_id):
+    return await client.get_messages(chat, ids=message_id)
+
+
+def main():
+    start_http_server()
+    start_snapshot_writer()
+    print("🚀 Бот запущен. Слушаем кастинги...")
+    client.start()
+    pending = jobs.depth()
+    if pending:
+        print(f"📥 В очереди с прошлого запуска: {pending}")
+    for n in range(MIRROR_WORKERS):
+        client.loop.create_task(run_worker(n, jobs, scheduler, pipeline, fetch_message, mirror_config, new_jobs))
+    client.run_until_disconnected()
+
+
+# OCR-воркеры на macOS стартуют через spawn и заново импортируют этот модуль как __mp_main__ —
+# без проверки каждый из них поднял бы свой Telegram-клиент и сервер метрик
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from shared.media import MediaBlob
+from shared.metrics import counter, histogram
+
+STAGE_SECONDS = histogram('mirror_stage_seconds', 'Время стадии пайплайна', ['stage'])
+STAGE_RESULTS = counter('mirror_stage_results_total', 'Исход стадии: passed, dropped (причина = стадия) или error', ['stage', 'result'])
+
+
+@dataclass
+class MessageContext:
+    """
+    Всё, что стадии пайплайна знают о сообщении. Стадии читают и дописывают поля по ходу.
+    """
+    event: Any  # None, если сообщение взято из очереди задач
+    message: Any
+    config: Dict[str, Any]
+    chat_id: Optional[int] = None
+    thread_id: Optional[int] = None
+    text: str = ''
+    sender_name: str = 'Источник неизвестен'
+    media: Optional[MediaBlob] = None  # фото в памяти (скачано один раз на все стадии)
+    ocr_text: str = ''
+    heuristic: Optional[str] = None
+    is_casting: Optional[bool] = None
+    fields: Optional[Dict[str, Any]] = None
+    formatted: Optional[str] = None
+    keep_photo: bool = False
+    drop_reason: Optional[str] = None
+
+    @property
+    def origin(self) -> str:
+        # ключ сообщения для дедупа: повтор задачи из очереди не должен стать дублем самого себя
+        return f"{self.chat_id}:{self.message.id}"
+
+    def drop_image(self):
+        if self.media:
+            self.media.close()
+            self.media = None
+
+
+StageFunc = Callable[[MessageContext], Awaitable[bool]]
+
+
+@dataclass
+class Stage:
+    """
+    Одна стадия. func возвращает True — сообщение идёт дальше, False — отбрасываем.
+    """
+    name: str
+    func: StageFunc
+    passed: int = 0
+    dropped: int = 0
+    errors: int = 0
+    total_time: float = 0.0
+    in_flight: int = 0  # сколько сообщений сейчас внутри стадии (для backpressure)
+
+    @property
+    def calls(self) -> int:
+        return self.passed + self.dropped + self.errors
+
+    def stats(self) -> Dict[str, Any]:
+        calls = self.calls
+        return {
+            "stage": self.name,
+            "calls": calls,
+            "passed": self.passed,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "total_s": round(self.total_time, 3),
+            "avg_ms": round(self.total_time / calls * 1000, 1) if calls else 0.0,
+        }
+
+
+class Pipeline:
+    """
+    Стадии идут от дешёвых к дорогим: как только одна вернула False — дальше не идём.
+    Исключение стадии считается и пробрасывается наверх: воркер вернёт задачу в очередь (nack).
+    """
+
+    def __init__(self, stages: List[Stage], report_every: int = 50):
+        self.stages = stages
+        self.report_every = report_every
+        self.processed = 0
+
+    async def run(self, ctx: MessageContext) -> bool:
+        try:
+            for stage in self.stages:
+                started = time.perf_counter()
+                stage.in_flight += 1
+                try:
+                    ok = await stage.func(ctx)
+                except Exception as e:
+                    stage.errors += 1
+                    STAGE_RESULTS.inc(stage=stage.name, result='error')
+                    ctx.drop_reason = f"{stage.name}: {e}"
+                    print(f"❌ Ошибка на стадии {stage.name}: {e}")
+                    raise
+                finally:
+                    elapsed = time.perf_counter() - started
+                    stage.in_flight -= 1
+                    stage.total_time += elapsed
+                    STAGE_SECONDS.observe(elapsed, stage=stage.name)
+
+                if not ok:
+                    stage.dropped += 1
+                    STAGE_RESULTS.inc(stage=stage.name, result='dropped')
+                    ctx.drop_reason = ctx.drop_reason or stage.name
+                    print(f"⛔ Отброшено на стадии {stage.name}: {ctx.drop_reason}")
+                    return False
+                stage.passed += 1
+                STAGE_RESULTS.inc(stage=stage.name, result='passed')
+            return True
+        finally:
+            ctx.drop_image()
+            self.processed += 1
+            if self.report_every and self.processed % self.report_every == 0:
+                self.report()
+
+    def stage(self, name: str) -> Optional[Stage]:
+        return next((s for s in self.stages if s.name == name), None)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [stage.stats() for stage in self.stages]
+
+    def report(self):
+        print(f"📊 Пайплайн: обработано {self.processed} сообщений")
+        for s in self.stats():
+            print(
+                f"   {s['stage']:<12} вызовов={s['calls']:<6} отброшено={s['dropped']:<6} "
+                f"ошибок={s['errors']:<4} всего={s['total_s']}s среднее={s['avg_ms']}ms"
+            )
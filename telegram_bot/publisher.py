@@ -0,0 +1,224 @@
+import asyncio
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import httpx
+from shared.metrics import counter, gauge, histogram
+
+# 📮 Асинхронная публикация через Bot API: одна keep-alive сессия, очередь исходящих,
+# пауза по retry_after при 429 и не чаще одного сообщения в PUBLISH_CHAT_INTERVAL секунд на чат.
+
+PUBLISH_WORKERS = int(os.getenv("PUBLISH_WORKERS", "2"))
+# Telegram: в группу не больше ~20 сообщений в минуту
+PUBLISH_CHAT_INTERVAL = float(os.getenv("PUBLISH_CHAT_INTERVAL", "3"))
+PUBLISH_MAX_RETRIES = int(os.getenv("PUBLISH_MAX_RETRIES", "5"))
+PUBLISH_TIMEOUT = float(os.getenv("PUBLISH_TIMEOUT", "30"))
+API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+
+LATENCY_WINDOW = 1000
+
+PUBLISH_SECONDS = histogram('publish_seconds', 'От постановки в очередь публикации до ответа Telegram', ['method'])
+PUBLISH_RESULTS = counter('publish_results_total', 'Итог публикации', ['method', 'result'])
+PUBLISH_RETRIES = counter('publish_retries_total', 'Повторы публикации по причине', ['reason'])
+PUBLISH_QUEUE = gauge('publish_queue_depth', 'Сообщений в очереди публикации')
+
+
+@dataclass
+class Outgoing:
+    method: str
+    chat_id: int
+    data: Dict[str, Any]
+    files: Optional[Dict[str, Any]] = None
+    future: Optional[asyncio.Future] = None
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+def _percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+class Publisher:
+    """
+    send_message/send_photo кладут сообщение в очередь и ждут, пока воркер его доставит.
+    429 и сетевые ошибки не теряют кастинг: ждём retry_after (или backoff) и пробуем снова.
+    """
+
+    def __init__(self, bot_token: str, workers: int = PUBLISH_WORKERS, chat_interval: float = PUBLISH_CHAT_INTERVAL,
+                 max_retries: int = PUBLISH_MAX_RETRIES, timeout: float = PUBLISH_TIMEOUT, api_url: str = API_URL):
+        self.base_url = f"{api_url}/bot{bot_token}/"
+        self.workers = workers
+        self.chat_interval = chat_interval
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._next_slot: Dict[int, float] = {}  # chat_id → когда можно слать следующее
+
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)  # от постановки в очередь до ответа Telegram
+
+    def _start(self):
+        # Очередь и воркеры создаём внутри event loop, при первой отправке
+        if self._queue is not None:
+            return
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            limits=httpx.Limits(max_connections=self.workers * 2, max_keepalive_connections=self.workers),
+            timeout=httpx.Timeout(self.timeout, connect=10.0),
+        )
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        PUBLISH_QUEUE.set_function(lambda: self.queue_depth)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _submit(self, job: Outgoing) -> bool:
+        self._start()
+        job.future = asyncio.get_running_loop().create_future()
+        await self._queue.put(job)
+        return await job.future
+
+    async def send_message(self, chat_id: int, text: str, thread_id: Optional[int] = None,
+                           parse_mode: str = "HTML") -> bool:
+        data = {"chat_id": chat_id, "text": text, "parse_mode": parse_mode}
+        if thread_id:
+            data["message_thread_id"] = thread_id
+        return await self._submit(Outgoing("sendMessage", chat_id, data))
+
+    async def send_photo(self, chat_id: int, photo: bytes, caption: str, thread_id: Optional[int] = None,
+                         parse_mode: str = "HTML") -> bool:
+        # multipart: значения полей — строки
+        data = {"chat_id": str(chat_id), "caption": caption, "parse_mode": parse_mode}
+        if thread_id:
+            data["message_thread_id"] = str(thread_id)
+        files = {"photo": ("photo.jpg", photo, "image/jpeg")}
+        return await self._submit(Outgoing("sendPhoto", chat_id, data, files))
+
+    async def _wait_slot(self, chat_id: int):
+        # Бронируем слот синхронно (без await между чтением и записью) — воркеры не пересекаются
+        now = time.monotonic()
+        slot = max(now, self._next_slot.get(chat_id, 0.0))
+        self._next_slot[chat_id] = slot + self.chat_interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def _pause_chat(self, chat_id: int, seconds: float):
+        self._next_slot[chat_id] = max(self._next_slot.get(chat_id, 0.0), time.monotonic() + seconds)
+
+    async def _post(self, job: Outgoing) -> httpx.Response:
+        if job.files:
+            return await self._client.post(job.method, data=job.data, files=job.files)
+        return await self._client.post(job.method, json=job.data)
+
+    async def _deliver(self, job: Outgoing) -> bool:
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.retries += 1
+            await self._wait_slot(job.chat_id)
+            try:
+                resp = await self._post(job)
+            except httpx.HTTPError as e:
+                delay = min(2 ** attempt, 30)
+                print(f"⚠️ {job.method}: сеть ({e!r}), повтор через {delay}s")
+                PUBLISH_RETRIES.inc(reason='network')
+                self._pause_chat(job.chat_id, delay)
+                continue
+
+            if resp.status_code == 200:
+                return True
+            try:
+                body = resp.json()
+            except ValueError:
+                body = {}
+            if resp.status_code == 429:
+                retry_after = float(body.get("parameters", {}).get("retry_after", 5))
+                self.rate_limited += 1
+                PUBLISH_RETRIES.inc(reason='429')
+                print(f"⏳ {job.method}: 429, Telegram просит подождать {retry_after}s")
+                self._pause_chat(job.chat_id, retry_after)
+                continue
+            if resp.status_code >= 500:
+                delay = min(2 ** attempt, 30)
+                print(f"⚠️ {job.method}: {resp.status_code}, повтор через {delay}s")
+                PUBLISH_RETRIES.inc(reason='5xx')
+                self._pause_chat(job.chat_id, delay)
+                continue
+            # 400/403 и т.п. — повтор не поможет
+            print(f"❌ {job.method}: {resp.status_code} {body.get('description', resp.text[:200])}")
+            return False
+        print(f"❌ {job.method}: не доставлено за {self.max_retries + 1} попыток")
+        return False
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                ok = await self._deliver(job)
+            except Exception as e:
+                print(f"❌ Ошибка публикации: {e}")
+                ok = False
+            finally:
+                self._queue.task_done()
+            elapsed = time.monotonic() - job.enqueued_at
+            self.latencies.append(elapsed)
+            PUBLISH_SECONDS.observe(elapsed, method=job.method)
+            PUBLISH_RESULTS.inc(method=job.method, result='ok' if ok else 'failed')
+            if ok:
+                self.sent += 1
+            else:
+                self.failed += 1
+            if not job.future.done():
+                job.future.set_result(ok)
+
+    def stats(self) -> Dict[str, Any]:
+        latencies = list(self.latencies)
+        total = self.sent + self.failed
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "success_rate": round(self.sent / total, 3) if total else None,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "queue_depth": self.queue_depth,
+            "latency_p50": round(_percentile(latencies, 0.50), 3),
+            "latency_p95": round(_percentile(latencies, 0.95), 3),
+        }
+
+    def report(self) -> str:
+        s = self.stats()
+        return (f"📮 Публикация: отправлено {s['sent']}, ошибок {s['failed']}, повторов {s['retries']} "
+                f"(429: {s['rate_limited']}), в очереди {s['queue_depth']}, "
+                f"p50 {s['latency_p50']}s, p95 {s['latency_p95']}s")
+
+    async def aclose(self):
+        # Сначала дожидаемся очереди, чтобы не потерять уже принятые кастинги
+        if self._queue is not None:
+            await self._queue.join()
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._queue = None
+
+
+_publishers: Dict[str, Publisher] = {}
+
+
+def get_publisher(bot_token: str) -> Publisher:
+    if bot_token not in _publishers:
+        _publishers[bot_token] = Publisher(bot_token)
+    return _publishers[bot_token]
@@ -0,0 +1,75 @@
+import base64
+import json
+import os
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from telegram_bot.stages import message_thread_id
+
+# 🎙️ Запись входящих сообщений в корпус (JSONL) для нагрузочного replay без Telegram.
+# Включается переменной MIRROR_RECORD_PATH. В корпусе живые тексты и фото — в git его не кладём.
+
+RECORD_PATH = os.getenv("MIRROR_RECORD_PATH", "")
+
+
+async def record_message(message, path: str = RECORD_PATH):
+    if not path:
+        return
+    try:
+        photo = await message.download_media(file=bytes) if message.photo else None
+        chat = await message.get_chat()
+        entry = {
+            "ts": message.date.timestamp() if message.date else time.time(),
+            "chat_id": message.chat_id,
+            "message_id": message.id,
+            "thread_id": message_thread_id(message),
+            "sender_name": getattr(chat, "title", "Источник неизвестен"),
+            "text": message.message or "",
+            "photo": base64.b64encode(photo).decode("ascii") if photo else None,
+        }
+        # одна строка за один write — в одном event loop строки не перемешиваются
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    except Exception as e:
+        print(f"⚠️ Не удалось записать сообщение в корпус: {e}")
+
+
+def load_corpus(path: str) -> List[Dict[str, Any]]:
+    entries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entries.append(json.loads(line))
+    entries.sort(key=lambda e: e["ts"])
+    return entries
+
+
+class ReplayMessage:
+    """
+    Сообщение из корпуса с тем же интерфейсом, что стадии берут у telethon Message.
+    """
+
+    def __init__(self, entry: Dict[str, Any]):
+        self.chat_id = entry["chat_id"]
+        self.id = entry["message_id"]
+        self.thread_id = entry.get("thread_id")
+        self.reply_to = None
+        self.message = entry.get("text") or ""
+        self._photo: Optional[bytes] = base64.b64decode(entry["photo"]) if entry.get("photo") else None
+        self.photo = bool(self._photo)
+        self.file = SimpleNamespace(size=len(self._photo)) if self._photo else None
+        self._chat = SimpleNamespace(title=entry.get("sender_name", "Источник неизвестен"))
+
+    async def get_chat(self):
+        return self._chat
+
+    async def download_media(self, file=None):
+        if not self._photo:
+            return None
+        if file is bytes:
+            return self._photo
+        path = f"replay_{self.chat_id}_{self.id}.jpg"
+        with open(path, "wb") as f:
+            f.write(self._photo)
+        return path
@@ -0,0 +1,168 @@
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+
+from shared.job_queue import Job, JobQueue
+from shared.metrics import counter, gauge, histogram
+
+# ⚖️ Взвешенная честная очередь по источникам: воркер берёт задачу не «самую старую вообще»,
+# а из источника с наименьшим виртуальным временем (stride scheduling). Источник с весом 3
+# получает втрое больше слотов, чем с весом 1, и болтливый чат не забивает профильные каналы.
+# Вес умножается на «выход» источника — долю сообщений, дошедших до публикации.
+
+# Backpressure: GPT не успевает (много сообщений внутри стадии llm) или очередь слишком длинная —
+# сначала откладываем источники с низким выходом, при сильной перегрузке сбрасываем их старые задачи.
+LLM_BACKPRESSURE_IN_FLIGHT = int(os.getenv("LLM_BACKPRESSURE_IN_FLIGHT", "8"))
+BACKLOG_SOFT = int(os.getenv("MIRROR_BACKLOG_SOFT", "100"))
+BACKLOG_HARD = int(os.getenv("MIRROR_BACKLOG_HARD", "500"))
+SHED_AGE_SECONDS = float(os.getenv("MIRROR_SHED_AGE_SECONDS", "1800"))
+
+LOW_YIELD = float(os.getenv("MIRROR_LOW_YIELD", "0.05"))
+MIN_YIELD_SAMPLES = 20  # пока сообщений меньше — источник не считаем малополезным
+WAIT_WINDOW = 200
+
+SOURCE_DEPTH = gauge('mirror_source_queue_depth', 'Готовых задач в очереди по источнику', ['source'])
+SOURCE_WAIT = histogram('mirror_source_wait_seconds', 'Ожидание задачи в очереди до воркера', ['source'])
+SOURCE_SHED = counter('mirror_source_shed_total', 'Задачи, сброшенные при перегрузке', ['source'])
+SOURCE_DEFERRED = counter('mirror_source_deferred_total', 'Сколько раз источник отложен из-за backpressure', ['source'])
+
+
+@dataclass
+class SourceState:
+    weight: float
+    vtime: float = 0.0
+    processed: int = 0
+    published: int = 0
+    deferred: int = 0
+    shed: int = 0
+    depth: int = 0
+    waits: deque = field(default_factory=lambda: deque(maxlen=WAIT_WINDOW))
+
+    @property
+    def yield_rate(self) -> float:
+        # сглаживание Лапласа: у нового источника выход 0.5, а не 0 или 1
+        return (self.published + 1) / (self.processed + 2)
+
+    @property
+    def low_yield(self) -> bool:
+        return self.processed >= MIN_YIELD_SAMPLES and self.yield_rate < LOW_YIELD
+
+    @property
+    def effective_weight(self) -> float:
+        return self.weight * (0.5 + self.yield_rate)
+
+
+class SourceScheduler:
+    """
+    next_job() — какую задачу взять воркеру; record() — чем закончилась обработка (для выхода).
+    pressure — функция без аргументов, True, когда стадия GPT не успевает.
+    """
+
+    def __init__(self, queue: JobQueue, weights: Dict[int, float], default_weight: float = 1.0,
+                 pressure: Optional[Callable[[], bool]] = None,
+                 backlog_soft: int = BACKLOG_SOFT, backlog_hard: int = BACKLOG_HARD,
+                 shed_age: float = SHED_AGE_SECONDS):
+        self.queue = queue
+        self.weights = weights
+        self.default_weight = default_weight
+        self.pressure = pressure or (lambda: False)
+        self.backlog_soft = backlog_soft
+        self.backlog_hard = backlog_hard
+        self.shed_age = shed_age
+        self.sources: Dict[int, SourceState] = {}
+        self.vclock = 0.0  # виртуальное время последней выданной задачи
+
+    def _state(self, chat_id: int) -> SourceState:
+        if chat_id not in self.sources:
+            self.sources[chat_id] = SourceState(weight=self.weights.get(chat_id, self.default_weight))
+        return self.sources[chat_id]
+
+    def next_job(self) -> Optional[Job]:
+        ready = self.queue.ready_by_source()
+        for chat_id, state in self.sources.items():
+            state.depth = ready.get(chat_id, (0, 0.0))[0]
+            SOURCE_DEPTH.set(state.depth, source=chat_id)
+        if not ready:
+            return None
+
+        backlog = sum(count for count, _ in ready.values())
+        overloaded = self.pressure() or backlog >= self.backlog_soft
+        candidates = list(ready)
+
+        if overloaded:
+            useful = [c for c in candidates if not self._state(c).low_yield]
+            if useful:
+                for c in candidates:
+                    if c not in useful:
+                        self._state(c).deferred += 1
+                        SOURCE_DEFERRED.inc(source=c)
+                candidates = useful
+        if backlog >= self.backlog_hard:
+            self._shed(ready)
+
+        # Источник, который простаивал, не копит «кредит»: его время подтягиваем к текущему
+        for c in candidates:
+            state = self._state(c)
+            state.vtime = max(state.vtime, self.vclock)
+
+        for chat_id in sorted(candidates, key=lambda c: self.sources[c].vtime):
+            job = self.queue.lease(chat_id)
+            if job is None:
+                continue
+            state = self.sources[chat_id]
+            self.vclock = state.vtime
+            state.vtime += 1.0 / state.effective_weight
+            waited = time.time() - job.enqueued_at
+            state.waits.append(waited)
+            SOURCE_WAIT.observe(waited, source=chat_id)
+            return job
+        return None
+
+    def _shed(self, ready):
+        cutoff = time.time() - self.shed_age
+        for chat_id, (_, oldest) in ready.items():
+            state = self._state(chat_id)
+            if state.low_yield and oldest < cutoff:
+                dropped = self.queue.shed(chat_id, cutoff)
+                if dropped:
+                    state.shed += dropped
+                    SOURCE_SHED.inc(dropped, source=chat_id)
+                    print(f"🧯 Перегрузка: сброшено {dropped} старых сообщений из {chat_id} "
+                          f"(выход {state.yield_rate:.0%})")
+
+    def record(self, chat_id: int, published: bool):
+        state = self._state(chat_id)
+        state.processed += 1
+        if published:
+            state.published += 1
+
+    def stats(self) -> Dict[int, dict]:
+        result = {}
+        for chat_id, s in self.sources.items():
+            waits = sorted(s.waits)
+            result[chat_id] = {
+                "weight": s.weight,
+                "effective_weight": round(s.effective_weight, 2),
+                "depth": s.depth,
+                "processed": s.processed,
+                "published": s.published,
+                "yield": round(s.yield_rate, 3),
+                "low_yield": s.low_yield,
+                "deferred": s.deferred,
+                "shed": s.shed,
+                "wait_avg_s": round(sum(waits) / len(waits), 2) if waits else 0.0,
+                "wait_max_s": round(waits[-1], 2) if waits else 0.0,
+            }
+        return result
+
+    def report(self) -> str:
+        lines = ["⚖️ Источники:"]
+        for chat_id, s in sorted(self.stats().items(), key=lambda kv: -kv[1]["depth"]):
+            lines.append(
+                f"   {chat_id:<15} вес={s['weight']:<4} выход={s['yield']:<6} очередь={s['depth']:<5} "
+                f"ожидание ср={s['wait_avg_s']}s макс={s['wait_max_s']}s "
+                f"отложено={s['deferred']} сброшено={s['shed']}"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,232 @@
+import os
+from shared.dedup_index import get_index
+from shared.image_hash import dhash
+from shared.isDuplicateCasting import is_duplicate_casting
+from shared.media import MediaBlob
+from shared.metrics import histogram
+from shared.ocr_extractor import extract_text_from_image_async
+from telegram_bot import casting_heuristics
+from telegram_bot.analyze_casting import analyze_casting
+from telegram_bot.format_casting_template import format_casting_template, render_casting_template
+from telegram_bot.is_casting_ai import is_casting_ai
+from telegram_bot.pipeline import MessageContext, Pipeline, Stage
+from telegram_bot.publisher import get_publisher
+
+# 🖼️ Дедуп афиш по перцептивному хэшу (до OCR и GPT)
+IMAGE_DEDUP = os.getenv("IMAGE_DEDUP", "1") == "1"
+
+# 🛡️ Порог для preview Telegram
+PREVIEW_MIN_BYTES = 15000
+PREVIEW_MAX_SIDE = 150
+
+DOWNLOAD_SECONDS = histogram('mirror_download_seconds', 'Скачивание фото из Telegram')
+
+# 📮 Как часто печатать статистику публикаций
+PUBLISH_REPORT_EVERY = 20
+
+# 🖼️ Фразы, при которых оставляем фото
+KEEP_PHOTO_TRIGGERS = [
+    "как на фото", "как на картинке", "как на изображении",
+    "см. фото", "смотри фото", "см. картинку",
+    "like the photo", "as in the photo", "see photo"
+]
+
+
+def message_thread_id(message):
+    return (
+        getattr(message, 'thread_id', None)
+        or getattr(message, 'message_thread_id', None)
+        or (message.reply_to.reply_to_msg_id if message.reply_to else None)
+    )
+
+
+def is_tracked_source(chat_id, thread_id, cfg) -> bool:
+    # хэндлер mirror.py проверяет это до очереди, чтобы не тянуть чужие темы через get_messages
+    return chat_id in cfg["source_without_topic"] or f"{chat_id}_{thread_id}" in cfg["source_threads"]
+
+
+# 1️⃣ Источник
+async def source_filter(ctx: MessageContext) -> bool:
+    message = ctx.message
+    cfg = ctx.config
+
+    # event нет, если сообщение пришло из очереди (воркер заново получил его через get_messages)
+    ctx.chat_id = message.chat_id
+    ctx.thread_id = message_thread_id(message)
+    chat_id_str = f"{ctx.chat_id}_{ctx.thread_id}"
+
+    if not is_tracked_source(ctx.chat_id, ctx.thread_id, cfg):
+        ctx.drop_reason = f"{chat_id_str} не в отслеживаемых"
+        return False
+    print(f"✅ Проходит фильтр: {chat_id_str}")
+
+    ctx.text = (getattr(message, 'message', '') or
+                getattr(message, 'text', '') or
+                getattr(message, 'raw_text', '')) or ''
+    sender = await message.get_chat()
+    ctx.sender_name = getattr(sender, 'title', 'Источник неизвестен')
+    print(f"\n📅 Новое сообщение из: {ctx.sender_name}")
+    if ctx.text:
+        print(f"📝 Текст: {ctx.text[:100]}...")
+    return True
+
+
+# 2️⃣ Фото + защита от preview Telegram (слишком маленькие/лёгкие)
+async def preview_check(ctx: MessageContext) -> bool:
+    if ctx.message.photo:
+        print("📷 Обнаружено фото, загружаем...")
+        # в память, а не в файл: дальше все стадии берут байты/картинку/base64 из ctx.media
+        with DOWNLOAD_SECONDS.time():
+            ctx.media = await MediaBlob.download(ctx.message)
+
+        if ctx.media:
+            file_size = ctx.media.size
+            print(f"⬇️ Скачано: {file_size} bytes")
+            try:
+                width, height = ctx.media.image().size
+            except Exception:
+                width, height = 0, 0
+
+            if file_size < PREVIEW_MIN_BYTES or (width <= PREVIEW_MAX_SIDE and height <= PREVIEW_MAX_SIDE):
+                print(f"⚠️ Фото — Telegram preview ({width}x{height}, {file_size} bytes). Удаляем.")
+                ctx.drop_image()
+
+    if not ctx.text.strip() and not ctx.media:
+        ctx.drop_reason = "нет ни текста, ни фото"
+        return False
+    return True
+
+
+# 3️⃣ Та же картинка уже была. Отбрасываем только перезалив без подписи: многие каналы ставят
+# одну и ту же фирменную обложку на все посты — с подписью решает текстовый дедуп
+async def image_dedup(ctx: MessageContext) -> bool:
+    if not ctx.media or not IMAGE_DEDUP:
+        return True
+    try:
+        phash = dhash(ctx.media.image())
+    except Exception as e:
+        print(f"⚠️ Не удалось посчитать хэш фото: {e}")
+        return True
+    is_dup, distance = get_index().check_and_add_image(phash, origin=ctx.origin)
+    if is_dup and not ctx.text.strip():
+        ctx.drop_reason = f"эта афиша уже была (отличие {distance} бит из 64)"
+        return False
+    if is_dup:
+        print(f"🖼️ Афиша уже встречалась (отличие {distance} бит), но есть подпись — проверит текстовый дедуп")
+    return True
+
+
+# 4️⃣ OCR — нужен дедупу, поэтому идёт до него
+async def ocr(ctx: MessageContext) -> bool:
+    ctx.ocr_text = await extract_text_from_image_async(ctx.media) if ctx.media else ''
+    return True
+
+
+# 5️⃣ Точный + fuzzy дедуп (до любых платных вызовов)
+async def dedup(ctx: MessageContext) -> bool:
+    if is_duplicate_casting(ctx.text, ctx.ocr_text, origin=ctx.origin):
+        ctx.drop_reason = "кастинг уже был"
+        return False
+    return True
+
+
+# 6️⃣ Дешёвый классификатор: локальный скоринг, в GPT идёт только unsure
+async def cheap_classifier(ctx: MessageContext) -> bool:
+    verdict, score, signals = casting_heuristics.score_casting(
+        ctx.text, ctx.ocr_text, has_image=bool(ctx.media)
+    )
+    ctx.heuristic = verdict
+    print(f"⚡ Локальный скоринг: {verdict} (балл {score}: {', '.join(signals) or '-'})")
+    if verdict == "no" and not casting_heuristics.SHADOW:
+        ctx.drop_reason = "не кастинг (локальный скоринг)"
+        return False
+    return True
+
+
+# 7️⃣ GPT
+async def llm_classifier(ctx: MessageContext) -> bool:
+    combined = ctx.config.get("llm_mode") == "combined"
+    shadow = casting_heuristics.SHADOW
+
+    if ctx.heuristic == "yes" and not combined and not shadow:
+        # уверенный локальный yes — is_casting_ai не нужен
+        ctx.is_casting = True
+    else:
+        # combined: один структурированный запрос вместо двух, шаблон потом собираем локально
+        if combined:
+            ctx.fields = await analyze_casting(ctx.text, ctx.media)
+        if ctx.fields is not None:
+            ctx.is_casting = bool(ctx.fields.get("is_casting"))
+        else:
+            ctx.is_casting = await is_casting_ai(ctx.text, ctx.media)
+
+        if shadow and ctx.heuristic:
+            casting_heuristics.shadow_stats.record(ctx.heuristic, ctx.is_casting)
+            print(f"👥 Shadow-сверка скоринга с GPT: {casting_heuristics.shadow_stats.report()}")
+        elif ctx.heuristic == "yes" and not ctx.is_casting:
+            # локальный yes сильнее ответа GPT, но при is_casting=false все поля — прочерки:
+            # такой шаблон не публикуем, его соберёт format_casting_template
+            ctx.is_casting = True
+            ctx.fields = None
+
+    if not ctx.is_casting:
+        ctx.drop_reason = "не кастинг"
+        return False
+    print("✅ Кастинг подтверждён")
+    return True
+
+
+# 8️⃣ Шаблон
+async def format_template(ctx: MessageContext) -> bool:
+    lc_text = (ctx.text or "").lower()
+    lc_ocr = (ctx.ocr_text or "").lower()
+    ctx.keep_photo = any(t in lc_text for t in KEEP_PHOTO_TRIGGERS) or any(t in lc_ocr for t in KEEP_PHOTO_TRIGGERS)
+
+    if ctx.fields is not None:
+        ctx.formatted = render_casting_template(ctx.fields)
+    else:
+        ctx.formatted = await format_casting_template(ctx.text, ctx.media)
+    return True
+
+
+# 9️⃣ Публикация (очередь + keep-alive сессия, 429 не теряет кастинг, отказ — повтор задачи)
+async def publish(ctx: MessageContext) -> bool:
+    cfg = ctx.config
+    publisher = get_publisher(cfg["bot_token"])
+
+    # 💬 Цитата источника
+    quote_html = f"<blockquote>Источник(Telegram): {ctx.sender_name}</blockquote>"
+    final_message = f"{ctx.formatted}\n\n{quote_html}"
+
+    # 🔗 отправляем фото капшеном, если нужно оставить изображение
+    if ctx.media and ctx.keep_photo:
+        print("🖼️ Отправляем шаблон с фото (caption).")
+        ok = await publisher.send_photo(cfg["chat_id"], ctx.media.read(), final_message, cfg["thread_id"])
+        print(f"📤 Фото+капшен {'отправлены' if ok else 'не отправлены'}.")
+    else:
+        ok = await publisher.send_message(cfg["chat_id"], final_message, cfg["thread_id"])
+        print(f"📤 Сообщение {'отправлено' if ok else 'не отправлено'}.")
+
+    if not ok or publisher.sent % PUBLISH_REPORT_EVERY == 0:
+        print(publisher.report())
+    if not ok:
+        # не отбрасываем: задача вернётся в очередь и кастинг попробуем опубликовать ещё раз
+        raise RuntimeError("Telegram не принял публикацию")
+    return True
+
+
+def build_pipeline(report_every: int = 50) -> Pipeline:
+    """
+    Порядок — от дешёвого к дорогому: всё, что можно отсеять локально, до GPT не доходит.
+    """
+    return Pipeline([
+        Stage("source", source_filter),
+        Stage("preview", preview_check),
+        Stage("image_dedup", image_dedup),
+        Stage("ocr", ocr),
+        Stage("dedup", dedup),
+        Stage("cheap", cheap_classifier),
+        Stage("llm", llm_classifier),
+        Stage("format", format_template),
+        Stage("publish", publish),
+    ], report_every=report_every)
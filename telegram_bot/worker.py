@@ -0,0 +1,49 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from shared.job_queue import Job, JobQueue
+from telegram_bot.pipeline import MessageContext, Pipeline
+from telegram_bot.scheduler import SourceScheduler
+
+# 👷 Воркер очереди: берёт задачу у планировщика, получает сообщение и прогоняет через пайплайн.
+# Откуда брать сообщение, решает вызывающий: mirror.py — client.get_messages, replay — корпус.
+
+JOB_POLL_SECONDS = 1.0
+
+FetchMessage = Callable[[int, int], Awaitable[Any]]
+
+
+async def run_worker(n: int, jobs: JobQueue, scheduler: SourceScheduler, pipeline: Pipeline,
+                     fetch_message: FetchMessage, config: Dict[str, Any], wake: asyncio.Event,
+                     on_done: Optional[Callable[[Job, bool], None]] = None):
+    while True:
+        wake.clear()
+        job = scheduler.next_job()
+        if job is None:
+            try:
+                await asyncio.wait_for(wake.wait(), timeout=JOB_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        try:
+            message = await fetch_message(job.chat_id, job.message_id)
+            if message is None:
+                print(f"🗑️ Сообщение {job.chat_id}/{job.message_id} уже удалено")
+                published = False
+            else:
+                ctx = MessageContext(event=None, message=message, config=config)
+                published = await pipeline.run(ctx)
+            jobs.ack(job)
+            scheduler.record(job.chat_id, published)
+            if pipeline.report_every and pipeline.processed % pipeline.report_every == 0:
+                print(scheduler.report())
+            if on_done is not None:
+                on_done(job, published)
+        except Exception as e:
+            # ошибка стадии или отказ публикации — не ack: задача вернётся в очередь
+            print(f"❌ Ошибка (воркер {n}): {e}")
+            jobs.nack(job, str(e))
+            if job.attempts >= jobs.max_attempts:
+                scheduler.record(job.chat_id, False)
+                if on_done is not None:
+                    on_done(job, False)